@@ -3,12 +3,76 @@ Admin configuration for OptiTrain API
 """
 
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from .models import (
     UserProfile, Exercise, WorkoutPlan, WorkoutSession,
     ExerciseLog, PerformanceMetric, ChatMessage, Goal
 )
 
 
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never counts a whole large table. Unfiltered
+    changelists on PostgreSQL use the planner's row estimate; everything
+    else counts at most ``count_cap`` rows, so past the cap the page links
+    stop at cap / list_per_page.
+    """
+    count_cap = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self._estimate(queryset)
+            if estimate is not None and estimate >= self.count_cap:
+                return estimate
+        # SELECT COUNT(*) FROM (SELECT id ... LIMIT count_cap)
+        return queryset.order_by().values('pk')[:self.count_cap].count()
+
+    def _estimate(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        return row[0] if row and row[0] > 0 else None
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables with millions of rows. Search never
+    joins: every search field is ``<foreign key>__<lookup>``, tried in
+    turn; the term is looked up on the related table and the first one
+    that matches filters this table by its indexed foreign key column.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    search_fields = ['user__username__exact']
+    search_id_limit = 100
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        for search_field in self.get_search_fields(request):
+            name, _, lookup = search_field.partition('__')
+            related = self.model._meta.get_field(name).related_model
+            ids = list(
+                related._default_manager.filter(**{lookup: term})
+                .values_list('pk', flat=True)[:self.search_id_limit]
+            )
+            if ids:
+                return queryset.filter(**{f'{name}_id__in': ids}), False
+        return queryset.none(), False
+
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'fitness_level', 'age', 'created_at']
@@ -31,28 +95,39 @@ class WorkoutPlanAdmin(admin.ModelAdmin):
 
 
 @admin.register(WorkoutSession)
-class WorkoutSessionAdmin(admin.ModelAdmin):
+class WorkoutSessionAdmin(LargeTableAdmin):
     list_display = ['name', 'user', 'date', 'duration_minutes', 'calories_burned']
     list_filter = ['date']
-    search_fields = ['name', 'user__username']
+    list_select_related = ['user']
+    autocomplete_fields = ['user', 'workout_plan']
 
 
 @admin.register(ExerciseLog)
-class ExerciseLogAdmin(admin.ModelAdmin):
+class ExerciseLogAdmin(LargeTableAdmin):
     list_display = ['exercise', 'session', 'sets', 'reps', 'weight']
     list_filter = ['exercise__muscle_group']
+    list_select_related = ['exercise', 'session']
+    autocomplete_fields = ['user', 'session', 'exercise']
+    # Exercise is a small catalogue, so its name prefix is cheap to resolve
+    search_fields = ['user__username__exact', 'exercise__name__startswith']
+    # Meta ordering on 'order' has no index; newest first walks the primary key
+    ordering = ['-id']
 
 
 @admin.register(PerformanceMetric)
-class PerformanceMetricAdmin(admin.ModelAdmin):
+class PerformanceMetricAdmin(LargeTableAdmin):
     list_display = ['user', 'metric_type', 'value', 'date']
     list_filter = ['metric_type', 'date']
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
 
 
 @admin.register(ChatMessage)
-class ChatMessageAdmin(admin.ModelAdmin):
+class ChatMessageAdmin(LargeTableAdmin):
     list_display = ['user', 'role', 'created_at']
-    list_filter = ['role']
+    list_filter = ['role', 'created_at']
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
 
 
 @admin.register(Goal)
@@ -0,0 +1,15 @@
+"""
+App configuration for OptiTrain API
+"""
+
+from django.apps import AppConfig
+
+
+class ApiConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'api'
+
+    def ready(self):
+        from . import routers, signals
+        routers.connect_signals()
+        signals.connect_signals()
@@ -0,0 +1,74 @@
+"""
+AI chat backends for OptiTrain API
+
+CHAT_BACKEND names the function that answers a chat message. It is
+imported on the first chat request, so model clients with heavy imports
+don't slow down worker start-up.
+"""
+
+import random
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULT_BACKEND = 'api.chat.generate_ai_response'
+
+
+@lru_cache(maxsize=None)
+def get_chat_backend():
+    """Resolve and cache the configured chat backend"""
+    return import_string(getattr(settings, 'CHAT_BACKEND', DEFAULT_BACKEND))
+
+
+def generate_ai_response(message):
+    """Generate contextual AI responses for fitness queries"""
+    # Simulated AI responses based on keywords
+    message_lower = message.lower()
+    
+    responses = {
+        'workout': [
+            "Based on your fitness level, I recommend starting with a full-body workout 3 times per week. Focus on compound movements like squats, deadlifts, and bench press for maximum efficiency.",
+            "Great question! For optimal results, try alternating between strength training and cardio. I suggest a push/pull/legs split if you can commit to 4-5 days per week.",
+            "Let me create a personalized workout plan for you. Would you prefer to focus on strength, endurance, or a balanced approach?",
+        ],
+        'diet': [
+            "Nutrition is crucial for your fitness goals! Aim for 1.6-2.2g of protein per kg of body weight if you're building muscle. Don't forget to stay hydrated!",
+            "For sustainable results, focus on whole foods: lean proteins, complex carbs, healthy fats, and plenty of vegetables. Would you like a sample meal plan?",
+            "Pre-workout, try eating complex carbs 2-3 hours before. Post-workout, aim for protein within 30-60 minutes to optimize recovery.",
+        ],
+        'rest': [
+            "Recovery is just as important as training! Aim for 7-9 hours of sleep and include at least 1-2 rest days per week.",
+            "Active recovery like light walking, stretching, or yoga can help reduce muscle soreness. Don't underestimate the power of rest!",
+            "Signs you need more rest: persistent fatigue, decreased performance, or mood changes. Listen to your body!",
+        ],
+        'motivation': [
+            "Remember, consistency beats perfection! Even a 15-minute workout is better than none. You've got this!",
+            "Set small, achievable goals and celebrate each milestone. Progress is progress, no matter how small!",
+            "Track your progress with photos and measurements, not just the scale. Your body is changing even when the numbers don't show it!",
+        ],
+        'weight': [
+            "For healthy weight loss, aim for 0.5-1kg per week through a moderate calorie deficit. Crash diets don't work long-term!",
+            "Building muscle can actually help with weight management as muscle burns more calories at rest. Consider adding resistance training!",
+            "Focus on body composition rather than just weight. You might be gaining muscle while losing fat!",
+        ],
+        'muscle': [
+            "For muscle growth, progressive overload is key. Gradually increase weight, reps, or sets over time.",
+            "The muscle-building sweet spot is typically 8-12 reps per set with weights that challenge you by the last few reps.",
+            "Don't forget about the mind-muscle connection! Focus on the muscle you're working for better activation and results.",
+        ],
+    }
+    
+    # Find matching category
+    for keyword, response_list in responses.items():
+        if keyword in message_lower:
+            return random.choice(response_list)
+    
+    # Default responses
+    default_responses = [
+        "I'm here to help with your fitness journey! You can ask me about workouts, nutrition, recovery, or motivation. What would you like to know?",
+        "That's a great question! To give you the best advice, could you tell me more about your current fitness level and goals?",
+        "I'd love to help you achieve your fitness goals! What specific area would you like to focus on - strength, cardio, flexibility, or nutrition?",
+    ]
+    
+    return random.choice(default_responses)
@@ -0,0 +1,41 @@
+"""
+Performance forecasting for OptiTrain API
+
+Imported on first use by the forecast endpoint and task workers, so the
+forecasting math stays out of worker start-up.
+"""
+
+import random
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .serializers import PerformanceForecastSerializer
+from .tasks import background_task
+
+
+@background_task
+def compute_performance_forecast(days=30):
+    """Compute the AI performance forecast"""
+    # Generate mock forecast data
+    forecasts = []
+    today = timezone.now().date()
+    
+    base_strength = 75
+    base_endurance = 70
+    
+    for i in range(days):
+        date = today + timedelta(days=i)
+        # Simulate gradual improvement with some variation
+        strength = base_strength + (i * 0.3) + random.uniform(-2, 2)
+        endurance = base_endurance + (i * 0.25) + random.uniform(-2, 2)
+        confidence = max(0.5, 0.95 - (i * 0.01))
+        
+        forecasts.append({
+            'date': date,
+            'predicted_strength': round(min(100, strength), 1),
+            'predicted_endurance': round(min(100, endurance), 1),
+            'confidence': round(confidence, 2),
+        })
+    
+    return PerformanceForecastSerializer(forecasts, many=True).data
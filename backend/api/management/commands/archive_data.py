@@ -0,0 +1,36 @@
+"""
+Move rows past their retention cutoff into compressed archive files
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.retention import retention_setting, run_policies
+
+
+class Command(BaseCommand):
+    help = 'Archive rows older than the RETENTION policies and delete them from the hot tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', action='append', dest='models',
+            help='Model label to archive, e.g. api.chatmessage (repeatable; default all policies)'
+        )
+        parser.add_argument(
+            '--format', choices=['auto', 'ndjson', 'parquet'], default=None,
+            help='Archive file format (default: RETENTION["FORMAT"])'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many rows would be archived'
+        )
+
+    def handle(self, *args, **options):
+        policies = retention_setting('POLICIES')
+        unknown = set(options['models'] or []) - set(policies)
+        if unknown:
+            raise CommandError(f'No retention policy for: {", ".join(sorted(unknown))}')
+
+        results = run_policies(options['models'], fmt=options['format'], dry_run=options['dry_run'])
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        for label, count in results.items():
+            self.stdout.write(f'{verb} {count} {label} rows')
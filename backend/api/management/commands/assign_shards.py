@@ -0,0 +1,35 @@
+"""
+Pin every user to their current shard before USER_SHARDING changes
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import ShardAssignment
+from api.routers import PRIMARY_DATABASE, default_shard, sharding_setting
+
+
+class Command(BaseCommand):
+    help = 'Store the shard of every user without one (run before adding databases to USER_SHARDING)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        databases = sharding_setting('DATABASES')
+        if len(databases) < 2:
+            raise CommandError('USER_SHARDING["DATABASES"] lists fewer than two databases')
+
+        assigned = set(
+            ShardAssignment.objects.using(PRIMARY_DATABASE).values_list('user_id', flat=True)
+        )
+        missing = [
+            ShardAssignment(user_id=pk, database=default_shard(pk, databases))
+            for pk in get_user_model()._base_manager.using(PRIMARY_DATABASE)
+            .values_list('pk', flat=True).iterator()
+            if pk not in assigned
+        ]
+        ShardAssignment.objects.using(PRIMARY_DATABASE).bulk_create(
+            missing, batch_size=options['batch_size'], ignore_conflicts=True
+        )
+        self.stdout.write(f'Assigned {len(missing)} users ({len(assigned)} already assigned)')
@@ -0,0 +1,96 @@
+"""
+Benchmark list serialization: ModelSerializer vs flat .values() serializers
+"""
+
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Exercise, WorkoutSession, ExerciseLog, PerformanceMetric
+from api.renderers import FastJSONRenderer
+from api.serializers import (
+    WorkoutSessionSerializer, PerformanceMetricSerializer,
+    FlatWorkoutSessionSerializer, FlatPerformanceMetricSerializer
+)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/sec of the list serializers and JSON renderers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000)
+        parser.add_argument('--logs-per-session', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user = self._seed(options['rows'], options['logs_per_session'])
+                self._run(user, options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _seed(self, rows, logs_per_session):
+        user = User.objects.create(username='bench-serializers')
+        exercise = Exercise.objects.create(name='Bench Press', muscle_group='chest')
+        today = date.today()
+        sessions = WorkoutSession.objects.bulk_create([
+            WorkoutSession(
+                user=user, name=f'Session {i}', date=today - timedelta(days=i),
+                duration_minutes=45, calories_burned=300,
+            )
+            for i in range(rows)
+        ])
+        ExerciseLog.objects.bulk_create([
+            ExerciseLog(user=user, session=session, exercise=exercise, sets=3, reps=10, weight=60.0, order=j)
+            for session in sessions
+            for j in range(logs_per_session)
+        ])
+        PerformanceMetric.objects.bulk_create([
+            PerformanceMetric(
+                user=user, date=today - timedelta(days=i), metric_type='strength', value=70.0 + i % 30
+            )
+            for i in range(rows)
+        ])
+        return user
+
+    def _run(self, user, repeat):
+        # Only the seeded rows, so existing data does not skew the numbers.
+        # The ModelSerializer case prefetches its nested logs, so both sides
+        # measure serialization rather than N+1 queries.
+        sessions = WorkoutSession.objects.for_user(user)
+        metrics = PerformanceMetric.objects.for_user(user)
+        cases = [
+            ('WorkoutSessionSerializer', sessions, lambda: WorkoutSessionSerializer(
+                sessions.prefetch_related('exercise_logs__exercise'), many=True).data),
+            ('FlatWorkoutSessionSerializer', sessions, lambda: FlatWorkoutSessionSerializer(
+                sessions).data),
+            ('PerformanceMetricSerializer', metrics, lambda: PerformanceMetricSerializer(
+                metrics, many=True).data),
+            ('FlatPerformanceMetricSerializer', metrics, lambda: FlatPerformanceMetricSerializer(
+                metrics).data),
+        ]
+        for name, queryset, build in cases:
+            self._report(name, queryset.count(), repeat, build)
+
+        data = FlatWorkoutSessionSerializer(sessions).data
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            self._report(type(renderer).__name__, len(data), repeat, lambda: renderer.render(data))
+
+    def _report(self, name, rows, repeat, fn):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        self.stdout.write(f'{name:<34} {rows / best:>12,.0f} rows/sec')
@@ -0,0 +1,67 @@
+"""
+Benchmark the per-request overhead of the token bucket throttles
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.throttling import ChatIPThrottle, coalescer, request_key
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measure token bucket limiter and request coalescer overhead per request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--clients', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['requests'], options['clients'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, total, clients):
+        factory = APIRequestFactory()
+        requests = [
+            Request(factory.post('/api/chat/', {'message': 'workout'}, format='json',
+                                 REMOTE_ADDR=f'10.0.{i // 256}.{i % 256}'),
+                    parsers=[JSONParser()])
+            for i in range(clients)
+        ]
+
+        throttle = ChatIPThrottle()
+        # Never deny, so every call takes the full read/refill/update path
+        throttle.capacity = float(total + 1)
+
+        # First touch creates each bucket row; report it separately
+        start = time.perf_counter()
+        for request in requests:
+            throttle.allow_request(request, None)
+        created = (time.perf_counter() - start) / clients
+
+        start = time.perf_counter()
+        for i in range(total):
+            throttle.allow_request(requests[i % clients], None)
+        per_request = (time.perf_counter() - start) / total
+
+        start = time.perf_counter()
+        for i in range(total):
+            request = requests[i % clients]
+            coalescer.do(request_key(request, 'chat'), lambda: None)
+        coalesced = (time.perf_counter() - start) / total
+
+        self.stdout.write(f'{"bucket create (first request)":<34} {created * 1e6:>10.1f} us/request')
+        self.stdout.write(f'{"token bucket allow_request":<34} {per_request * 1e6:>10.1f} us/request')
+        self.stdout.write(f'{"request coalescer":<34} {coalesced * 1e6:>10.1f} us/request')
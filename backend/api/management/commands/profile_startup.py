@@ -0,0 +1,125 @@
+"""
+Profile cold start of a fresh worker: import time per module, app-ready
+time and resident memory
+"""
+
+import json
+import os
+import subprocess
+import sys
+from statistics import median
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so nothing is already imported
+WORKER_SCRIPT = r'''
+import json, os, sys, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', %(settings)r)
+import django
+django.setup()
+ready = time.perf_counter()
+from optitrain.wsgi import application
+from django.urls import get_resolver
+get_resolver().url_patterns
+loaded = time.perf_counter()
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_kb = rss / 1024 if sys.platform == 'darwin' else rss
+except ImportError:
+    rss_kb = None
+print(json.dumps({
+    'app_ready_ms': (ready - start) * 1000,
+    'total_ms': (loaded - start) * 1000,
+    'rss_mb': rss_kb / 1024 if rss_kb is not None else None,
+}))
+'''
+
+
+def parse_importtime(stderr):
+    """Parse `python -X importtime` output into (module, self_us, cumulative_us)"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Report import time per module, app-ready time and RSS of a fresh worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help='Modules to list')
+        parser.add_argument('--runs', type=int, default=3, help='Fresh workers to time (median is reported)')
+        parser.add_argument(
+            '--max-startup-ms', type=float, default=None,
+            help="Fail if cold start exceeds this (default STARTUP_BUDGET['MAX_STARTUP_MS'])",
+        )
+        parser.add_argument(
+            '--max-rss-mb', type=float, default=None,
+            help="Fail if resident memory exceeds this (default STARTUP_BUDGET['MAX_RSS_MB'])",
+        )
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        script = WORKER_SCRIPT % {'settings': os.environ.get('DJANGO_SETTINGS_MODULE', 'optitrain.settings')}
+        runs = [self._run_worker(script, importtime=(i == 0)) for i in range(max(1, options['runs']))]
+
+        modules = runs[0][1]
+        samples = [sample for sample, _ in runs]
+        # The importtime run is slower and allocates more, so it is only used
+        # for the module table when there are other runs to measure
+        timed = samples[1:] or samples
+        result = {
+            'app_ready_ms': median(s['app_ready_ms'] for s in timed),
+            'total_ms': median(s['total_ms'] for s in timed),
+            'rss_mb': timed[0]['rss_mb'] and median(s['rss_mb'] for s in timed),
+            'modules': [
+                {'module': name, 'self_ms': self_us / 1000, 'cumulative_ms': cumulative_us / 1000}
+                for name, self_us, cumulative_us in sorted(modules, key=lambda m: m[2], reverse=True)
+                [:options['top']]
+            ],
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+        else:
+            self._print(result)
+
+        budget = getattr(settings, 'STARTUP_BUDGET', {})
+        max_startup_ms = options['max_startup_ms'] or budget.get('MAX_STARTUP_MS')
+        max_rss_mb = options['max_rss_mb'] or budget.get('MAX_RSS_MB')
+        failures = []
+        if max_startup_ms and result['total_ms'] > max_startup_ms:
+            failures.append(f"cold start {result['total_ms']:.0f} ms > {max_startup_ms:.0f} ms")
+        if max_rss_mb and result['rss_mb'] and result['rss_mb'] > max_rss_mb:
+            failures.append(f"RSS {result['rss_mb']:.1f} MB > {max_rss_mb:.1f} MB")
+        if failures:
+            raise CommandError('Startup budget exceeded: ' + '; '.join(failures))
+
+    def _run_worker(self, script, importtime):
+        command = [sys.executable]
+        if importtime:
+            command += ['-X', 'importtime']
+        command += ['-c', script]
+        proc = subprocess.run(
+            command, cwd=settings.BASE_DIR, capture_output=True, text=True, check=False
+        )
+        if proc.returncode != 0:
+            raise CommandError(f'Worker failed to start:\n{proc.stderr}')
+        sample = json.loads(proc.stdout.strip().splitlines()[-1])
+        return sample, parse_importtime(proc.stderr) if importtime else []
+
+    def _print(self, result):
+        self.stdout.write(f"{'module':<50} {'self ms':>9} {'cumul. ms':>10}")
+        for row in result['modules']:
+            self.stdout.write(f"{row['module']:<50} {row['self_ms']:>9.1f} {row['cumulative_ms']:>10.1f}")
+        self.stdout.write('')
+        self.stdout.write(f"app ready (django.setup): {result['app_ready_ms']:.1f} ms")
+        self.stdout.write(f"worker ready (wsgi + urls): {result['total_ms']:.1f} ms")
+        if result['rss_mb'] is not None:
+            self.stdout.write(f"max RSS: {result['rss_mb']:.1f} MB")
@@ -0,0 +1,15 @@
+"""
+Delete rate limit buckets that have been idle for a full refill period
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.throttling import prune_idle_buckets
+
+
+class Command(BaseCommand):
+    help = 'Delete idle RateLimitBucket rows (run periodically, e.g. hourly from cron)'
+
+    def handle(self, *args, **options):
+        deleted = prune_idle_buckets()
+        self.stdout.write(f'Deleted {deleted} idle rate limit buckets')
@@ -0,0 +1,15 @@
+"""
+Delete sync tombstones older than SYNC_TOMBSTONE_TTL
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sync tombstones (run periodically, e.g. daily from cron)'
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(f'Deleted {deleted} expired tombstones')
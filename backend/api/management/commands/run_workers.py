@@ -0,0 +1,84 @@
+"""
+Run background task workers against the database queue
+"""
+
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def process_worker(*args):
+    """
+    Entry point for --mode process. Under the 'spawn' and 'forkserver' start
+    methods the child starts a fresh interpreter, so Django has to be set up
+    before the task models can be imported. This module therefore must not
+    import api.tasks at the top level.
+    """
+    django.setup()
+    from api.tasks import work
+    work(*args)
+
+
+class Command(BaseCommand):
+    help = 'Run background task workers (thread or process pool, no broker required)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Number of workers (default: TASK_QUEUE["WORKERS"])'
+        )
+        parser.add_argument(
+            '--mode', choices=['thread', 'process'], default=None,
+            help='Run workers as threads or processes (default: TASK_QUEUE["MODE"])'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once no due tasks are left'
+        )
+
+    def handle(self, *args, **options):
+        from api.tasks import queue_setting, work
+
+        workers = options['workers'] or queue_setting('WORKERS')
+        mode = options['mode'] or queue_setting('MODE')
+        if workers < 1:
+            raise CommandError('--workers must be at least 1')
+
+        if mode == 'process':
+            stop_event = multiprocessing.Event()
+            # Forked children must open their own database connections
+            connections.close_all()
+            pool = [
+                multiprocessing.Process(
+                    target=process_worker, args=(self._worker_id(i), stop_event, options['burst'])
+                )
+                for i in range(workers)
+            ]
+        else:
+            stop_event = threading.Event()
+            pool = [
+                threading.Thread(target=work, args=(self._worker_id(i), stop_event, options['burst']))
+                for i in range(workers)
+            ]
+
+        def stop(signum, frame):
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write(f'Starting {workers} {mode} worker(s)')
+        for worker in pool:
+            worker.start()
+        for worker in pool:
+            worker.join()
+        self.stdout.write('Workers stopped')
+
+    def _worker_id(self, index):
+        return f'{socket.gethostname()}:{os.getpid()}:{index}'
@@ -0,0 +1,31 @@
+"""
+Managers for OptiTrain API
+"""
+
+from django.db import models
+
+from .routers import shard_for
+
+
+class UserScopedQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """Rows owned by ``user`` (a User or its id), read from that user's shard"""
+        user_id = getattr(user, 'pk', user)
+        queryset = self.filter(user_id=user_id)
+        alias = shard_for(self.model, user_id)
+        if alias is not None and self._db is None:
+            queryset = queryset.using(alias)
+        return queryset
+
+    def create(self, **kwargs):
+        # QuerySet.create() saves with an explicit alias, bypassing the router
+        if self._db is None:
+            user = kwargs.get('user', kwargs.get('user_id'))
+            alias = shard_for(self.model, getattr(user, 'pk', user))
+            if alias is not None:
+                return self.using(alias).create(**kwargs)
+        return super().create(**kwargs)
+
+
+class UserScopedManager(models.Manager.from_queryset(UserScopedQuerySet)):
+    """Default manager for per-user models; always query through ``for_user``"""
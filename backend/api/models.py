@@ -4,6 +4,10 @@ Models for OptiTrain API
 
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .managers import UserScopedManager
 
 
 class UserProfile(models.Model):
@@ -59,6 +63,7 @@ class Exercise(models.Model):
     )
     calories_per_minute = models.FloatField(default=5.0)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
@@ -81,7 +86,12 @@ class WorkoutPlan(models.Model):
     )
     duration_weeks = models.IntegerField(default=4)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = UserScopedManager()
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'updated_at'])]
 
     def __str__(self):
         return f"{self.name} - {self.user.username}"
@@ -94,7 +104,7 @@ class WorkoutSession(models.Model):
         WorkoutPlan, on_delete=models.SET_NULL, null=True, blank=True, related_name='sessions'
     )
     name = models.CharField(max_length=200)
-    date = models.DateField()
+    date = models.DateField(db_index=True)
     start_time = models.TimeField(null=True, blank=True)
     end_time = models.TimeField(null=True, blank=True)
     duration_minutes = models.IntegerField(default=0)
@@ -109,9 +119,21 @@ class WorkoutSession(models.Model):
         null=True, blank=True
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = UserScopedManager()
 
     class Meta:
         ordering = ['-date', '-start_time']
+        indexes = [
+            models.Index(fields=['user', '-date']),
+            models.Index(fields=['user', 'updated_at']),
+            # Prefix search from the admin (name__startswith) on PostgreSQL
+            models.Index(
+                fields=['name'], name='workoutsession_name_prefix_idx',
+                opclasses=['varchar_pattern_ops'],
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.date}"
@@ -119,6 +141,10 @@ class WorkoutSession(models.Model):
 
 class ExerciseLog(models.Model):
     """Individual exercise entries within a workout session"""
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='exercise_logs',
+        help_text="Owner of the session, copied on save for per-user queries"
+    )
     session = models.ForeignKey(
         WorkoutSession, on_delete=models.CASCADE, related_name='exercise_logs'
     )
@@ -130,18 +156,27 @@ class ExerciseLog(models.Model):
     distance_meters = models.FloatField(null=True, blank=True)
     notes = models.TextField(blank=True)
     order = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = UserScopedManager()
 
     class Meta:
         ordering = ['order']
+        indexes = [models.Index(fields=['user', 'updated_at'])]
 
     def __str__(self):
         return f"{self.exercise.name} - {self.sets}x{self.reps}"
 
+    def save(self, *args, **kwargs):
+        if self.user_id is None and self.session_id is not None:
+            self.user_id = self.session.user_id
+        super().save(*args, **kwargs)
+
 
 class PerformanceMetric(models.Model):
     """Track user performance over time for forecasting"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='performance_metrics')
-    date = models.DateField()
+    date = models.DateField(db_index=True)
     metric_type = models.CharField(
         max_length=50,
         choices=[
@@ -154,10 +189,14 @@ class PerformanceMetric(models.Model):
     )
     value = models.FloatField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = UserScopedManager()
 
     class Meta:
         ordering = ['-date']
         unique_together = ['user', 'date', 'metric_type']
+        indexes = [models.Index(fields=['user', 'updated_at'])]
 
     def __str__(self):
         return f"{self.user.username} - {self.metric_type}: {self.value}"
@@ -174,10 +213,13 @@ class ChatMessage(models.Model):
         ]
     )
     content = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    objects = UserScopedManager()
 
     class Meta:
         ordering = ['created_at']
+        indexes = [models.Index(fields=['user', 'created_at'])]
 
     def __str__(self):
         return f"{self.role}: {self.content[:50]}..."
@@ -194,7 +236,12 @@ class Goal(models.Model):
     deadline = models.DateField(null=True, blank=True)
     is_completed = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = UserScopedManager()
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'updated_at'])]
 
     def __str__(self):
         return f"{self.title} - {self.user.username}"
@@ -204,3 +251,117 @@ class Goal(models.Model):
         if self.target_value and self.target_value > 0:
             return min(100, (self.current_value / self.target_value) * 100)
         return 0
+
+
+class Tombstone(models.Model):
+    """Record of a deleted row, consumed by the delta sync endpoint"""
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, null=True, blank=True, related_name='tombstones'
+    )
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['deleted_at']
+        indexes = [models.Index(fields=['user', 'deleted_at'])]
+
+    def __str__(self):
+        return f"{self.model}#{self.object_id} deleted {self.deleted_at}"
+
+
+class Task(models.Model):
+    """Background task queued in the database and run by `manage.py run_workers`"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, null=True, blank=True, related_name='tasks'
+    )
+    name = models.CharField(max_length=200, help_text="Dotted path of the task function")
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            (PENDING, 'Pending'),
+            (RUNNING, 'Running'),
+            (SUCCEEDED, 'Succeeded'),
+            (FAILED, 'Failed'),
+        ],
+        default=PENDING
+    )
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    dedupe_key = models.CharField(
+        max_length=64, blank=True, help_text="Identical in-flight tasks share this key"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_after']
+        indexes = [models.Index(fields=['status', 'run_after'])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=models.Q(status__in=['pending', 'running']) & ~models.Q(dedupe_key=''),
+                name='unique_inflight_task',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
+class RateLimitBucket(models.Model):
+    """Token bucket state shared by all workers for API throttling"""
+    key = models.CharField(max_length=200, unique=True)
+    tokens = models.FloatField()
+    stamp = models.FloatField(help_text="Unix time of the last refill")
+
+    def __str__(self):
+        return f"{self.key}: {self.tokens:.2f}"
+
+
+class ArchiveSegment(models.Model):
+    """A file of rows moved out of a hot table by the retention pipeline"""
+    model = models.CharField(max_length=100)
+    database = models.CharField(max_length=100, default='default')
+    path = models.CharField(max_length=500)
+    format = models.CharField(
+        max_length=20,
+        choices=[
+            ('ndjson', 'Gzip NDJSON'),
+            ('parquet', 'Parquet'),
+        ]
+    )
+    row_count = models.IntegerField(default=0)
+    min_date = models.DateTimeField()
+    max_date = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['min_date']
+        indexes = [models.Index(fields=['model', 'max_date'])]
+
+    def __str__(self):
+        return f"{self.model} {self.min_date:%Y-%m-%d}..{self.max_date:%Y-%m-%d} ({self.row_count} rows)"
+
+
+class ShardAssignment(models.Model):
+    """Database holding a user's sharded rows; set once and never recomputed"""
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name='shard_assignment'
+    )
+    database = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.database}"
@@ -0,0 +1,279 @@
+"""
+Data retention and archival for OptiTrain API
+
+Rows older than a per-model cutoff (RETENTION['POLICIES']) are copied into
+compressed archive files and then deleted from the hot table in short,
+chunked transactions. Each file is recorded as an ArchiveSegment so the
+export endpoint can still serve archived rows on demand. Rollups such as
+PerformanceMetric and the workout sessions behind the dashboards are not
+archived.
+"""
+
+import gzip
+import json
+import logging
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.utils import encoders
+
+from .models import ArchiveSegment, ChatMessage, ExerciseLog
+from .routers import is_sharded, shard_for, sharding_setting
+from .signals import tombstones_suppressed
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ARCHIVE_ROOT': Path(settings.BASE_DIR) / 'archive',
+    'FORMAT': 'auto',
+    'CHUNK_SIZE': 1000,
+    'MAX_ROWS': 50000,
+    'POLICIES': {},
+}
+
+# Export keys for models with a retention policy
+EXPORT_MODELS = {
+    'chat-messages': ChatMessage,
+    'exercise-logs': ExerciseLog,
+}
+
+
+def retention_setting(name):
+    return getattr(settings, 'RETENTION', {}).get(name, DEFAULTS[name])
+
+
+def _pyarrow():
+    """Import pyarrow on first use, since it is slow to load; None if not installed"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def resolve_format(requested=None):
+    """'parquet' when asked for (or 'auto') and pyarrow is installed, else 'ndjson'"""
+    requested = requested or retention_setting('FORMAT')
+    if requested in ('parquet', 'auto') and _pyarrow() is not None:
+        return 'parquet'
+    if requested == 'parquet':
+        logger.warning('pyarrow is not installed, archiving as gzip NDJSON')
+    return 'ndjson'
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _databases(model):
+    databases = sharding_setting('DATABASES')
+    if is_sharded(model) and len(databases) > 1:
+        return databases
+    return ['default']
+
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+class _NDJSONWriter:
+    def __init__(self, path):
+        self.file = gzip.open(path, 'wt', encoding='utf-8')
+
+    def write(self, rows):
+        for row in rows:
+            self.file.write(json.dumps(row, cls=encoders.JSONEncoder))
+            self.file.write('\n')
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    # Buffered so the schema is inferred from every row, not just the first
+    # chunk; MAX_ROWS bounds the buffer.
+    def __init__(self, path):
+        self.path = path
+        self.rows = []
+
+    def write(self, rows):
+        self.rows.extend(rows)
+
+    def close(self):
+        pyarrow = _pyarrow()
+        table = pyarrow.Table.from_pylist(self.rows)
+        pyarrow.parquet.write_table(table, self.path, compression='zstd')
+
+
+def archive_model(model, days, date_field, fmt=None, chunk_size=None, max_rows=None, dry_run=False):
+    """
+    Archive ``model`` rows whose ``date_field`` is older than ``days``.
+    Returns the number of rows archived (or that would be, with ``dry_run``).
+    """
+    fmt = resolve_format(fmt)
+    chunk_size = chunk_size or retention_setting('CHUNK_SIZE')
+    max_rows = max_rows or retention_setting('MAX_ROWS')
+    cutoff = timezone.now() - timedelta(days=days)
+    columns = [field.attname for field in model._meta.concrete_fields]
+
+    total = 0
+    for alias in _databases(model):
+        manager = model._default_manager.db_manager(alias)
+        pks = list(
+            manager.filter(**{f'{date_field}__lt': cutoff})
+            .order_by('pk')
+            .values_list('pk', flat=True)[:max_rows]
+        )
+        total += len(pks)
+        if not pks or dry_run:
+            continue
+
+        label = model._meta.label_lower
+        directory = Path(retention_setting('ARCHIVE_ROOT')) / label
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = timezone.now().strftime('%Y%m%dT%H%M%S%f')
+        suffix = 'parquet' if fmt == 'parquet' else 'ndjson.gz'
+        path = directory / f'{model._meta.model_name}-{alias}-{stamp}.{suffix}'
+
+        writer = _ParquetWriter(path) if fmt == 'parquet' else _NDJSONWriter(path)
+        min_date = max_date = None
+        try:
+            for chunk in _chunks(pks, chunk_size):
+                rows = list(manager.filter(pk__in=chunk).order_by('pk').values(*columns))
+                for row in rows:
+                    value = row[date_field]
+                    min_date = value if min_date is None else min(min_date, value)
+                    max_date = value if max_date is None else max(max_date, value)
+                writer.write(rows)
+        finally:
+            writer.close()
+
+        ArchiveSegment.objects.create(
+            model=label,
+            database=alias,
+            path=str(path),
+            format=fmt,
+            row_count=len(pks),
+            min_date=min_date,
+            max_date=max_date,
+        )
+
+        # Delete only once the file is complete, one short transaction per
+        # chunk. Rows edited since they were copied no longer match the
+        # cutoff and stay live; export prefers the live row. Archiving is
+        # not a delete from a sync client's point of view, so no tombstones.
+        deleted = 0
+        with tombstones_suppressed():
+            for chunk in _chunks(pks, chunk_size):
+                with transaction.atomic(using=alias):
+                    # Lock first, so an edit cannot land between the cutoff
+                    # check and the delete collector's own query
+                    expired = list(
+                        manager.filter(pk__in=chunk, **{f'{date_field}__lt': cutoff})
+                        .select_for_update().values_list('pk', flat=True)
+                    )
+                    deleted += manager.filter(pk__in=expired).delete()[0]
+
+        logger.info(
+            'Archived %s %s rows from %s to %s (%s deleted, %s kept after later edits)',
+            len(pks), label, alias, path, deleted, len(pks) - deleted
+        )
+
+    return total
+
+
+def run_policies(labels=None, fmt=None, dry_run=False):
+    """Apply every configured retention policy, or only those in ``labels``"""
+    results = {}
+    for label, policy in retention_setting('POLICIES').items():
+        if labels and label not in labels:
+            continue
+        model = apps.get_model(label)
+        results[label] = archive_model(
+            model, policy['days'], policy['date_field'], fmt=fmt, dry_run=dry_run
+        )
+    return results
+
+
+def _read_segment(segment, user_id):
+    if segment.format == 'parquet':
+        pyarrow = _pyarrow()
+        if pyarrow is None:
+            raise RuntimeError(f'pyarrow is required to read {segment.path}')
+        table = pyarrow.parquet.read_table(segment.path, filters=[('user_id', '=', user_id)])
+        yield from table.to_pylist()
+        return
+    with gzip.open(segment.path, 'rt', encoding='utf-8') as file:
+        for line in file:
+            row = json.loads(line)
+            if row.get('user_id') == user_id:
+                yield row
+
+
+def _in_range(value, start, end):
+    value = _as_datetime(value)
+    return (start is None or value >= start) and (end is None or value < end)
+
+
+def export_rows(model, user, start=None, end=None):
+    """
+    Yield ``user``'s rows of ``model`` dated in [start, end), from the hot
+    table first and then from any archive segment overlapping the range.
+    ``start`` and ``end`` are dates; rows use API field names.
+    """
+    label = model._meta.label_lower
+    date_field = retention_setting('POLICIES')[label]['date_field']
+    start = timezone.make_aware(datetime.combine(start, time.min)) if start else None
+    end = timezone.make_aware(datetime.combine(end, time.min)) if end else None
+    names = {field.attname: field.name for field in model._meta.concrete_fields}
+
+    hot = model.objects.for_user(user)
+    if start is not None:
+        hot = hot.filter(**{f'{date_field}__gte': start})
+    if end is not None:
+        hot = hot.filter(**{f'{date_field}__lt': end})
+
+    seen = set()
+    for row in hot.order_by('pk').values(*names).iterator():
+        seen.add(row['id'])
+        yield {names[key]: value for key, value in row.items()}
+
+    segments = ArchiveSegment.objects.filter(
+        model=label, database=shard_for(model, user.pk) or 'default'
+    )
+    if start is not None:
+        segments = segments.filter(max_date__gte=start)
+    if end is not None:
+        segments = segments.filter(min_date__lt=end)
+
+    chunk_size = retention_setting('CHUNK_SIZE')
+    for segment in segments:
+        rows = (
+            row for row in _read_segment(segment, user.pk)
+            if row['id'] not in seen and _in_range(row[date_field], start, end)
+        )
+        for chunk in _chunks(list(rows), chunk_size):
+            # A row left hot by an interrupted run, or edited after it was
+            # copied, may since have moved outside the range; the live row
+            # wins either way, so drop archived ids that still exist at all
+            live = set(
+                model.objects.for_user(user)
+                .filter(pk__in=[row['id'] for row in chunk])
+                .values_list('pk', flat=True)
+            )
+            for row in chunk:
+                if row['id'] in live or row['id'] in seen:
+                    continue
+                seen.add(row['id'])
+                yield {names[key]: value for key, value in row.items() if key in names}
@@ -0,0 +1,141 @@
+"""
+Database routing for OptiTrain API
+
+When USER_SHARDING lists more than one database, rows of the per-user
+tables in USER_SHARDING['MODELS'] are spread across them by user. All of
+one user's plans, sessions, logs and metrics live on the same shard, so a
+request only ever touches one database and every foreign key between them
+stays within it.
+
+A user's shard is chosen once, as ``user_id % len(DATABASES)`` at the
+time, and stored in ShardAssignment on 'default'. Adding a database later
+only affects users assigned after that; run `manage.py assign_shards`
+before changing the list so every existing user is pinned first. Primary
+keys are allocated per database, so ids of sharded rows are only unique
+within one user's data.
+
+Foreign keys are enforced per database, so each shard also carries a copy
+of the rows the sharded tables point at (USER_SHARDING['REPLICATED'], i.e.
+User and Exercise). ``connect_signals`` keeps those copies in step with
+'default': saving a row there writes it to every shard, and deleting it
+deletes the copies, which cascades to the user's sharded rows. Copy
+existing rows once when sharding is turned on; bulk ``update()`` calls
+bypass the signals. Everything else, including Tombstone and
+ArchiveSegment, lives only on 'default'.
+"""
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import setting_changed
+from django.db.models.signals import post_save, pre_delete
+
+PRIMARY_DATABASE = 'default'
+
+# user id -> alias; assignments never change, so caching them is safe
+_assignments = {}
+
+
+def sharding_setting(name):
+    return getattr(settings, 'USER_SHARDING', {}).get(name) or []
+
+
+def is_sharded(model):
+    return model._meta.label_lower in sharding_setting('MODELS')
+
+
+def shard_for(model, user_id):
+    """Database alias holding ``model`` rows for ``user_id``, or None if not sharded"""
+    databases = sharding_setting('DATABASES')
+    if len(databases) < 2 or user_id is None or not is_sharded(model):
+        return None
+    return assigned_shard(int(user_id))
+
+
+def default_shard(user_id, databases):
+    """Shard for a user who has no assignment yet"""
+    return databases[user_id % len(databases)]
+
+
+def assigned_shard(user_id):
+    """The user's stored shard, assigning one on first use"""
+    alias = _assignments.get(user_id)
+    if alias is None:
+        ShardAssignment = apps.get_model('api', 'ShardAssignment')
+        assignment, _ = ShardAssignment.objects.using(PRIMARY_DATABASE).get_or_create(
+            user_id=user_id,
+            defaults={'database': default_shard(user_id, sharding_setting('DATABASES'))},
+        )
+        alias = _assignments[user_id] = assignment.database
+    return alias
+
+
+class UserShardRouter:
+    """Route sharded models by the user id of the instance in the hints"""
+
+    def _route(self, model, hints):
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        if isinstance(instance, get_user_model()):
+            user_id = instance.pk
+        else:
+            user_id = getattr(instance, 'user_id', None)
+        return shard_for(model, user_id)
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if is_sharded(type(obj1)) or is_sharded(type(obj2)):
+            return True
+        return None
+
+
+def _replicas(using):
+    """Shard aliases to mirror a write on ``using`` to; none unless it is the primary"""
+    databases = sharding_setting('DATABASES')
+    if using != PRIMARY_DATABASE or len(databases) < 2:
+        return []
+    return [alias for alias in databases if alias != using]
+
+
+def replicate_save(sender, instance, using, raw=False, **kwargs):
+    if raw:
+        return
+    values = {
+        field.attname: getattr(instance, field.attname)
+        for field in sender._meta.concrete_fields if not field.primary_key
+    }
+    for alias in _replicas(using):
+        sender._base_manager.using(alias).update_or_create(pk=instance.pk, defaults=values)
+
+
+def replicate_delete(sender, instance, using, **kwargs):
+    # Runs before the primary delete, so tombstones written for the
+    # cascaded shard rows are swept up by the primary's own cascade
+    for alias in _replicas(using):
+        sender._base_manager.using(alias).filter(pk=instance.pk).delete()
+
+
+def assign_new_user(sender, instance, created, using, raw=False, **kwargs):
+    if created and not raw and _replicas(using):
+        assigned_shard(instance.pk)
+
+
+def reset_assignment_cache(setting, **kwargs):
+    if setting == 'USER_SHARDING':
+        _assignments.clear()
+
+
+def connect_signals():
+    """Pin new users to a shard and mirror the replicated models to every shard"""
+    post_save.connect(assign_new_user, sender=get_user_model(), dispatch_uid='shard-assign-user')
+    setting_changed.connect(reset_assignment_cache, dispatch_uid='shard-reset-assignments')
+    for label in sharding_setting('REPLICATED'):
+        model = apps.get_model(label)
+        post_save.connect(replicate_save, sender=model, dispatch_uid=f'shard-replicate-save-{label}')
+        pre_delete.connect(replicate_delete, sender=model, dispatch_uid=f'shard-replicate-delete-{label}')
@@ -3,13 +3,42 @@ Serializers for OptiTrain API
 """
 
 from rest_framework import serializers
+from rest_framework.validators import UniqueTogetherValidator
 from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist
 from .models import (
     UserProfile, Exercise, WorkoutPlan, WorkoutSession,
-    ExerciseLog, PerformanceMetric, ChatMessage, Goal
+    ExerciseLog, PerformanceMetric, ChatMessage, Goal, Task
 )
 
 
+class UserScopedRelationsMixin:
+    """
+    Only accept related rows owned by the requesting user, and check
+    unique_together constraints against that user's rows on their shard
+    """
+    scoped_relations = {}
+
+    def get_validators(self):
+        validators = super().get_validators()
+        request = self.context.get('request')
+        if request is not None and request.user.is_authenticated:
+            for validator in validators:
+                if isinstance(validator, UniqueTogetherValidator):
+                    validator.queryset = self.Meta.model.objects.for_user(request.user)
+        return validators
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is not None and request.user.is_authenticated:
+            for name, model in self.scoped_relations.items():
+                field = fields.get(name)
+                if field is not None and not field.read_only:
+                    field.queryset = model.objects.for_user(request.user)
+        return fields
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -32,34 +61,44 @@ class ExerciseSerializer(serializers.ModelSerializer):
 
 
 class WorkoutPlanSerializer(serializers.ModelSerializer):
+    user = serializers.PrimaryKeyRelatedField(read_only=True, default=serializers.CurrentUserDefault())
+
     class Meta:
         model = WorkoutPlan
         fields = '__all__'
-        read_only_fields = ['user', 'created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at']
 
 
-class ExerciseLogSerializer(serializers.ModelSerializer):
+class ExerciseLogSerializer(UserScopedRelationsMixin, serializers.ModelSerializer):
+    user = serializers.PrimaryKeyRelatedField(read_only=True, default=serializers.CurrentUserDefault())
     exercise_name = serializers.CharField(source='exercise.name', read_only=True)
+    scoped_relations = {'session': WorkoutSession}
 
     class Meta:
         model = ExerciseLog
         fields = '__all__'
 
 
-class WorkoutSessionSerializer(serializers.ModelSerializer):
+class WorkoutSessionSerializer(UserScopedRelationsMixin, serializers.ModelSerializer):
+    user = serializers.PrimaryKeyRelatedField(read_only=True, default=serializers.CurrentUserDefault())
     exercise_logs = ExerciseLogSerializer(many=True, read_only=True)
+    scoped_relations = {'workout_plan': WorkoutPlan}
 
     class Meta:
         model = WorkoutSession
         fields = '__all__'
-        read_only_fields = ['user', 'created_at']
+        read_only_fields = ['created_at']
+
 
+class PerformanceMetricSerializer(UserScopedRelationsMixin, serializers.ModelSerializer):
+    # Read-only, but defaulted to the requesting user so DRF validates
+    # unique_together sets that include it
+    user = serializers.PrimaryKeyRelatedField(read_only=True, default=serializers.CurrentUserDefault())
 
-class PerformanceMetricSerializer(serializers.ModelSerializer):
     class Meta:
         model = PerformanceMetric
         fields = '__all__'
-        read_only_fields = ['user', 'created_at']
+        read_only_fields = ['created_at']
 
 
 class ChatMessageSerializer(serializers.ModelSerializer):
@@ -70,12 +109,23 @@ class ChatMessageSerializer(serializers.ModelSerializer):
 
 
 class GoalSerializer(serializers.ModelSerializer):
+    user = serializers.PrimaryKeyRelatedField(read_only=True, default=serializers.CurrentUserDefault())
     progress_percentage = serializers.ReadOnlyField()
 
     class Meta:
         model = Goal
         fields = '__all__'
-        read_only_fields = ['user', 'created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at']
+
+
+class TaskSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Task
+        fields = [
+            'id', 'name', 'status', 'attempts', 'max_attempts',
+            'run_after', 'result', 'error', 'created_at', 'updated_at',
+        ]
+        read_only_fields = fields
 
 
 class WorkoutStatsSerializer(serializers.Serializer):
@@ -95,3 +145,95 @@ class PerformanceForecastSerializer(serializers.Serializer):
     predicted_strength = serializers.FloatField()
     predicted_endurance = serializers.FloatField()
     confidence = serializers.FloatField()
+
+
+class FlatSerializer:
+    """
+    Read-only list serializer that builds rows from .values() dictionaries.
+
+    Output matches ``source_serializer`` for list responses, but skips the
+    per-row ModelSerializer field machinery. ``lookups`` maps output names
+    that are not plain model columns to a .values() lookup. ``attached``
+    names fields a subclass fills in after the query; they keep their
+    position in the output and start out empty.
+    """
+    source_serializer = None
+    lookups = {}
+    attached = ()
+
+    _converted = (
+        serializers.DateField, serializers.DateTimeField,
+        serializers.TimeField, serializers.FloatField,
+    )
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    @classmethod
+    def get_columns(cls):
+        """(output name, values() lookup, converter or None) for each field"""
+        if '_columns' not in cls.__dict__:
+            model = cls.source_serializer.Meta.model
+            columns = []
+            for name, field in cls.source_serializer().fields.items():
+                if name in cls.attached:
+                    columns.append((name, None, None))
+                    continue
+                if name in cls.lookups:
+                    lookup = cls.lookups[name]
+                else:
+                    try:
+                        model_field = model._meta.get_field(name)
+                    except FieldDoesNotExist:
+                        continue
+                    if not model_field.concrete:
+                        continue
+                    lookup = model_field.attname
+                converter = field.to_representation if isinstance(field, cls._converted) else None
+                columns.append((name, lookup, converter))
+            cls._columns = columns
+        return cls._columns
+
+    def to_rows(self):
+        columns = self.get_columns()
+        rows = self.queryset.values(*[lookup for _, lookup, _ in columns if lookup is not None])
+        return [
+            {
+                name: [] if lookup is None
+                else row[lookup] if converter is None or row[lookup] is None
+                else converter(row[lookup])
+                for name, lookup, converter in columns
+            }
+            for row in rows
+        ]
+
+    @property
+    def data(self):
+        return self.to_rows()
+
+
+class FlatExerciseLogSerializer(FlatSerializer):
+    source_serializer = ExerciseLogSerializer
+    lookups = {'exercise_name': 'exercise__name'}
+
+
+class FlatWorkoutSessionSerializer(FlatSerializer):
+    source_serializer = WorkoutSessionSerializer
+    attached = ('exercise_logs',)
+
+    def to_rows(self):
+        rows = super().to_rows()
+        logs = FlatExerciseLogSerializer(
+            ExerciseLog.objects.using(self.queryset.db)
+            .filter(session__in=self.queryset.values('pk'))
+        ).data
+        by_session = {}
+        for log in logs:
+            by_session.setdefault(log['session'], []).append(log)
+        for row in rows:
+            row['exercise_logs'] = by_session.get(row['id'], [])
+        return rows
+
+
+class FlatPerformanceMetricSerializer(FlatSerializer):
+    source_serializer = PerformanceMetricSerializer
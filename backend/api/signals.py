@@ -0,0 +1,72 @@
+"""
+Signal receivers that keep sync tombstones up to date
+
+Connected from ApiConfig.ready(), so this module only imports models and
+routers; the serializers sync responses need are loaded by api.sync on
+the first sync request instead of at worker start.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.apps import apps
+from django.db.models import SET_NULL
+from django.db.models.signals import pre_delete
+from django.utils import timezone
+
+from .models import Tombstone
+from .routers import PRIMARY_DATABASE, is_sharded
+
+# Labels of the models in api.sync.SYNC_MODELS
+SYNCED_MODELS = [
+    'api.exercise',
+    'api.workoutplan',
+    'api.workoutsession',
+    'api.exerciselog',
+    'api.performancemetric',
+    'api.goal',
+]
+
+_tombstones_suppressed = ContextVar('tombstones_suppressed', default=False)
+
+
+@contextmanager
+def tombstones_suppressed():
+    """Delete rows without telling sync clients, e.g. when moving them to the archive"""
+    token = _tombstones_suppressed.set(True)
+    try:
+        yield
+    finally:
+        _tombstones_suppressed.reset(token)
+
+
+def record_tombstone(sender, instance, using, **kwargs):
+    if _tombstones_suppressed.get():
+        return
+    # Deleting the shard copies of a replicated row is not a separate delete
+    if using != PRIMARY_DATABASE and not is_sharded(sender):
+        return
+    # Tombstones stay on the default database even when the row was sharded
+    Tombstone.objects.create(
+        model=sender._meta.label_lower,
+        object_id=instance.pk,
+        user_id=getattr(instance, 'user_id', None),
+    )
+
+
+def touch_nulled_relations(sender, instance, using, **kwargs):
+    # on_delete=SET_NULL is a bulk UPDATE that skips auto_now; bump
+    # updated_at first so the rows losing their reference are re-sent
+    for relation in sender._meta.related_objects:
+        if relation.on_delete is SET_NULL and relation.related_model._meta.label_lower in SYNCED_MODELS:
+            relation.related_model._base_manager.using(using).filter(
+                **{relation.field.name: instance}
+            ).update(updated_at=timezone.now())
+
+
+def connect_signals():
+    """Write a tombstone whenever a synced row is deleted"""
+    for label in SYNCED_MODELS:
+        model = apps.get_model(label)
+        pre_delete.connect(record_tombstone, sender=model, dispatch_uid=f'sync-tombstone-{label}')
+        pre_delete.connect(touch_nulled_relations, sender=model, dispatch_uid=f'sync-touch-{label}')
@@ -0,0 +1,134 @@
+"""
+Delta sync support for offline-first clients
+
+Every model served by the API routers is listed in SYNC_MODELS. Rows are
+picked up through their indexed ``updated_at`` column and deletes through
+``Tombstone`` rows written by a pre_delete signal, so the cost of a sync
+follows the number of changes since the client's token rather than the
+size of its history. The receivers live in api.signals so that worker
+start does not import the serializers.
+"""
+
+import base64
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (
+    Exercise, WorkoutPlan, WorkoutSession, ExerciseLog,
+    PerformanceMetric, Goal, Tombstone
+)
+
+TOKEN_VERSION = 'v1'
+
+DEFAULT_SAFETY_LAG = 60
+DEFAULT_TOMBSTONE_TTL = 30
+
+# (payload key, model, serializer name in api.serializers, whether rows
+# belong to a user); keep api.signals.SYNCED_MODELS in step
+SYNC_MODELS = [
+    ('exercises', Exercise, 'ExerciseSerializer', False),
+    ('workout-plans', WorkoutPlan, 'WorkoutPlanSerializer', True),
+    ('workout-sessions', WorkoutSession, 'WorkoutSessionSerializer', True),
+    ('exercise-logs', ExerciseLog, 'ExerciseLogSerializer', True),
+    ('performance-metrics', PerformanceMetric, 'PerformanceMetricSerializer', True),
+    ('goals', Goal, 'GoalSerializer', True),
+]
+
+_RELATED = {
+    WorkoutSession: {'prefetch': ['exercise_logs__exercise']},
+    ExerciseLog: {'select': ['exercise']},
+}
+
+
+def encode_token(moment):
+    """Turn a timestamp into an opaque sync token"""
+    raw = f"{TOKEN_VERSION}:{moment.isoformat()}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Recover the timestamp from a sync token, raising ValueError if malformed"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        version, _, value = base64.urlsafe_b64decode(padded).decode().partition(':')
+        moment = datetime.fromisoformat(value)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError('Invalid sync token') from exc
+    if version != TOKEN_VERSION or moment.tzinfo is None:
+        raise ValueError('Invalid sync token')
+    return moment
+
+
+def safety_lag():
+    """How far the returned token trails the sync time"""
+    return timedelta(seconds=getattr(settings, 'SYNC_SAFETY_LAG', DEFAULT_SAFETY_LAG))
+
+
+def tombstone_ttl():
+    """How long tombstones, and therefore delta tokens, stay valid"""
+    return timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_TTL', DEFAULT_TOMBSTONE_TTL))
+
+
+def collect_changes(since, until, user):
+    """
+    Gather ``user``'s rows changed in (since, until] plus tombstones for
+    deleted rows. A missing ``since`` returns a full snapshot for the
+    initial sync. The returned token is ``until`` minus the safety lag, so
+    rows committed late with an earlier timestamp are picked up next time.
+    A ``since`` older than the tombstone TTL also gets a full snapshot,
+    since deletes from that far back may have been pruned.
+    """
+    from . import serializers
+
+    if since is not None and since < until - tombstone_ttl():
+        since = None
+
+    changes = {}
+    deleted = {}
+
+    for key, model, serializer_name, scoped in SYNC_MODELS:
+        queryset = model.objects.for_user(user) if scoped else model.objects.all()
+        queryset = queryset.filter(updated_at__lte=until)
+        if since is not None:
+            queryset = queryset.filter(updated_at__gt=since)
+
+        related = _RELATED.get(model, {})
+        if related.get('select'):
+            queryset = queryset.select_related(*related['select'])
+        if related.get('prefetch'):
+            queryset = queryset.prefetch_related(*related['prefetch'])
+
+        serializer_class = getattr(serializers, serializer_name)
+        changes[key] = serializer_class(queryset, many=True).data
+        deleted[key] = []
+
+    if since is not None:
+        labels = {model._meta.label_lower: key for key, model, _, _ in SYNC_MODELS}
+        tombstones = Tombstone.objects.filter(
+            Q(user=user) | Q(user__isnull=True),
+            deleted_at__gt=since, deleted_at__lte=until, model__in=labels
+        )
+        for model_label, object_id in tombstones.values_list('model', 'object_id'):
+            deleted[labels[model_label]].append(object_id)
+
+    token = until - safety_lag()
+    if since is not None:
+        # Never hand back a token older than the one the client sent
+        token = max(token, since)
+
+    return {
+        'token': encode_token(token),
+        'full': since is None,
+        'changes': changes,
+        'deleted': deleted,
+    }
+
+
+def prune_tombstones(now=None):
+    """Delete tombstones older than the TTL; returns the number deleted"""
+    cutoff = (now or timezone.now()) - tombstone_ttl()
+    return Tombstone.objects.filter(deleted_at__lt=cutoff).delete()[0]
+
@@ -0,0 +1,262 @@
+"""
+Database-backed background task queue
+
+Tasks are plain functions marked with @background_task and enqueued by
+dotted path. Workers started by `manage.py run_workers` claim rows from
+the Task table with a conditional UPDATE, so any number of threads or
+processes can share the queue without an external broker.
+
+A claim counts as an attempt, so a task that kills its worker still runs
+out of attempts. While a task runs, a heartbeat thread keeps its lock
+fresh; a lock older than VISIBILITY_TIMEOUT means the worker is gone and
+the task may be claimed again. Results are only written by the worker that
+still holds the lock.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WORKERS': 2,
+    'MODE': 'thread',
+    'POLL_INTERVAL': 1.0,
+    'BATCH_SIZE': 10,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_BACKOFF': 2.0,
+    'RETRY_BACKOFF_MAX': 600,
+    'VISIBILITY_TIMEOUT': 300,
+    'HEARTBEAT_INTERVAL': None,
+}
+
+
+def queue_setting(name):
+    return getattr(settings, 'TASK_QUEUE', {}).get(name, DEFAULTS[name])
+
+
+def background_task(fn):
+    """Mark a module-level function as runnable by the task workers"""
+    fn.is_background_task = True
+    fn.task_name = f'{fn.__module__}.{fn.__qualname__}'
+    return fn
+
+
+def enqueue(fn, user=None, max_attempts=None, coalesce=False, **payload):
+    """
+    Queue a call to ``fn(**payload)`` and return the Task row.
+    With ``coalesce`` an identical pending or running task for the same
+    user is returned instead of queueing the work twice.
+    """
+    if not getattr(fn, 'is_background_task', False):
+        raise ValueError(f'{fn!r} is not a background task')
+    user = user if user is not None and user.is_authenticated else None
+
+    dedupe_key = ''
+    if coalesce:
+        dedupe_key = hashlib.sha256(json.dumps(
+            [fn.task_name, user.pk if user else None, payload],
+            sort_keys=True, cls=DjangoJSONEncoder
+        ).encode()).hexdigest()
+        existing = _inflight(dedupe_key)
+        if existing is not None:
+            return existing
+
+    try:
+        with transaction.atomic():
+            return Task.objects.create(
+                name=fn.task_name,
+                payload=payload,
+                user=user,
+                max_attempts=max_attempts or queue_setting('MAX_ATTEMPTS'),
+                dedupe_key=dedupe_key,
+            )
+    except IntegrityError:
+        # Lost the race against another worker queueing the same task
+        existing = _inflight(dedupe_key) if dedupe_key else None
+        if existing is None:
+            raise
+        return existing
+
+
+def _inflight(dedupe_key):
+    return Task.objects.filter(
+        dedupe_key=dedupe_key, status__in=[Task.PENDING, Task.RUNNING]
+    ).first()
+
+
+def retry_delay(attempts):
+    """Exponential backoff in seconds after the given number of failed attempts"""
+    delay = queue_setting('RETRY_BACKOFF') * (2 ** (attempts - 1))
+    return min(delay, queue_setting('RETRY_BACKOFF_MAX'))
+
+
+def heartbeat_interval():
+    """Seconds between lock refreshes; a third of VISIBILITY_TIMEOUT by default"""
+    return queue_setting('HEARTBEAT_INTERVAL') or queue_setting('VISIBILITY_TIMEOUT') / 3
+
+
+def claim_next(worker_id):
+    """
+    Claim the next due task for this worker, or return None.
+    Running tasks whose lock is older than VISIBILITY_TIMEOUT are treated as
+    abandoned by a dead worker and can be claimed again, unless they have
+    used up their attempts, in which case they are marked failed.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=queue_setting('VISIBILITY_TIMEOUT'))
+    abandoned = Task.objects.filter(status=Task.RUNNING, locked_at__lt=stale)
+
+    exhausted = abandoned.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.FAILED, error='Worker lost while running the final attempt',
+        locked_at=None, locked_by='', updated_at=now
+    )
+    if exhausted:
+        logger.error('Marked %s abandoned task(s) as failed', exhausted)
+
+    candidates = list(
+        Task.objects.filter(status=Task.PENDING, run_after__lte=now)
+        .values_list('pk', flat=True)[:queue_setting('BATCH_SIZE')]
+    )
+    candidates += list(
+        abandoned.values_list('pk', flat=True)[:queue_setting('BATCH_SIZE')]
+    )
+
+    for pk in candidates:
+        claimed = (
+            Task.objects.filter(pk=pk)
+            .filter(status=Task.PENDING, run_after__lte=now)
+            .update(
+                status=Task.RUNNING, attempts=F('attempts') + 1,
+                locked_at=now, locked_by=worker_id, updated_at=now
+            )
+        ) or (
+            Task.objects.filter(pk=pk)
+            .filter(status=Task.RUNNING, locked_at__lt=stale, attempts__lt=F('max_attempts'))
+            .update(
+                attempts=F('attempts') + 1,
+                locked_at=now, locked_by=worker_id, updated_at=now
+            )
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+class Heartbeat(threading.Thread):
+    """Refresh the lock on a running task until stopped"""
+
+    def __init__(self, task, interval):
+        super().__init__(name=f'heartbeat-{task.pk}', daemon=True)
+        self.task = task
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                refreshed = Task.objects.filter(
+                    pk=self.task.pk, status=Task.RUNNING, locked_by=self.task.locked_by
+                ).update(locked_at=timezone.now())
+                if not refreshed:
+                    logger.warning('Task %s lock lost, stopping heartbeat', self.task.pk)
+                    break
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_task(task):
+    """
+    Execute a task claimed by ``claim_next`` and record its result, retry or
+    failure. Returns False if another worker took the lock in the meantime,
+    in which case nothing is written.
+    """
+    heartbeat = Heartbeat(task, heartbeat_interval())
+    heartbeat.start()
+    try:
+        fn = import_string(task.name)
+        if not getattr(fn, 'is_background_task', False):
+            raise ValueError(f'{task.name} is not a background task')
+        result = fn(**task.payload)
+        # Fail here, inside the retry path, rather than in the final UPDATE
+        json.dumps(result, cls=DjangoJSONEncoder)
+        task.result = result
+    except Exception:
+        task.error = traceback.format_exc()
+        if task.attempts < task.max_attempts:
+            task.status = Task.PENDING
+            task.run_after = timezone.now() + timedelta(seconds=retry_delay(task.attempts))
+            logger.warning('Task %s failed, retrying (attempt %s)', task.pk, task.attempts)
+        else:
+            task.status = Task.FAILED
+            logger.error('Task %s failed after %s attempts', task.pk, task.attempts)
+    else:
+        task.status = Task.SUCCEEDED
+        task.error = ''
+    finally:
+        heartbeat.stop()
+
+    # Conditional on still holding the lock, so a worker whose task was
+    # reclaimed cannot overwrite the newer run's outcome
+    written = Task.objects.filter(
+        pk=task.pk, status=Task.RUNNING, locked_by=task.locked_by
+    ).update(
+        result=task.result, error=task.error, status=task.status,
+        run_after=task.run_after, locked_at=None, locked_by='',
+        updated_at=timezone.now()
+    )
+    if not written:
+        logger.warning('Task %s was reclaimed by another worker, discarding this run', task.pk)
+        return False
+    task.locked_at = None
+    task.locked_by = ''
+    return True
+
+
+def work(worker_id, stop_event=None, burst=False):
+    """
+    Worker loop: claim and run tasks until ``stop_event`` is set.
+    With ``burst`` the loop exits as soon as the queue is empty. Errors
+    are logged and the loop keeps polling.
+    """
+    poll_interval = queue_setting('POLL_INTERVAL')
+    try:
+        while stop_event is None or not stop_event.is_set():
+            try:
+                close_old_connections()
+                task = claim_next(worker_id)
+                if task is not None:
+                    run_task(task)
+                    continue
+            except Exception:
+                # A database error must not shrink the pool; a task caught
+                # mid-run is claimed again once its lock goes stale
+                logger.exception('Worker %s hit an error, polling again', worker_id)
+                connection.close()
+            else:
+                if burst:
+                    break
+            if stop_event is not None:
+                stop_event.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+    finally:
+        connection.close()
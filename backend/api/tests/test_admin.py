@@ -0,0 +1,72 @@
+"""
+Tests for the large-table admin changelists
+"""
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.admin import EstimatedCountPaginator
+from api.models import Exercise, WorkoutSession, ExerciseLog, PerformanceMetric, ChatMessage
+
+
+class AdminTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.user = User.objects.create_user(username='athlete')
+        self.squat = Exercise.objects.create(name='Squat', muscle_group='legs')
+        row = Exercise.objects.create(name='Row', muscle_group='back')
+        session = WorkoutSession.objects.create(user=self.user, name='Legs', date=timezone.now().date())
+        self.logs = [
+            ExerciseLog.objects.create(session=session, exercise=exercise, reps=5)
+            for exercise in (self.squat, row)
+        ]
+        PerformanceMetric.objects.create(
+            user=self.user, metric_type='weight', value=80, date=timezone.now().date()
+        )
+        ChatMessage.objects.create(user=self.user, role='user', content='Hi')
+        self.client.force_login(self.admin)
+
+    def changelist(self, model, **params):
+        url = f'/admin/api/{model._meta.model_name}/'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries]
+
+    def test_changelists_render_without_distinct_scans(self):
+        for model in (WorkoutSession, ExerciseLog, PerformanceMetric, ChatMessage):
+            with self.subTest(model=model.__name__):
+                _, sql = self.changelist(model)
+                self.assertFalse([query for query in sql if 'DISTINCT' in query])
+
+    def test_search_filters_by_foreign_key_without_join(self):
+        response, sql = self.changelist(ExerciseLog, q='athlete')
+
+        self.assertEqual(
+            {log.pk for log in response.context['cl'].result_list}, {log.pk for log in self.logs}
+        )
+        counts = [query for query in sql if 'COUNT(' in query and 'api_exerciselog' in query]
+        self.assertTrue(counts)
+        self.assertFalse([query for query in counts if 'JOIN' in query])
+
+    def test_search_falls_back_to_exercise_prefix(self):
+        response, _ = self.changelist(ExerciseLog, q='Squ')
+
+        self.assertEqual([log.pk for log in response.context['cl'].result_list], [self.logs[0].pk])
+
+    def test_search_without_match_is_empty(self):
+        response, _ = self.changelist(ExerciseLog, q='nobody')
+
+        self.assertEqual(list(response.context['cl'].result_list), [])
+
+    def test_filtered_count_stops_at_cap(self):
+        paginator = EstimatedCountPaginator(ExerciseLog.objects.filter(reps=5).order_by('pk'), 1)
+        paginator.count_cap = 1
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(paginator.count, 1)
+        self.assertIn('LIMIT 1', queries[0]['sql'])
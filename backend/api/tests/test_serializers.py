@@ -0,0 +1,95 @@
+"""
+Tests for the flat list serializers and the orjson renderer
+"""
+
+import uuid
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Exercise, WorkoutSession, ExerciseLog, PerformanceMetric
+from api.renderers import FastJSONRenderer
+from api.serializers import (
+    WorkoutSessionSerializer, ExerciseLogSerializer, PerformanceMetricSerializer,
+    FlatWorkoutSessionSerializer, FlatExerciseLogSerializer, FlatPerformanceMetricSerializer
+)
+
+
+class FlatSerializerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='athlete')
+        squat = Exercise.objects.create(name='Squat', muscle_group='legs')
+        row = Exercise.objects.create(name='Row', muscle_group='back')
+        today = date.today()
+        for i in range(3):
+            session = WorkoutSession.objects.create(
+                user=user, name=f'Session {i}', date=today - timedelta(days=i),
+                start_time=time(7, 30), duration_minutes=40 + i, mood_before=3,
+            )
+            ExerciseLog.objects.create(session=session, exercise=squat, sets=3, reps=5, weight=100.5, order=1)
+            ExerciseLog.objects.create(session=session, exercise=row, sets=3, duration_seconds=60, order=0)
+        WorkoutSession.objects.create(user=user, name='Empty', date=today)
+        for metric_type in ('strength', 'endurance'):
+            PerformanceMetric.objects.create(user=user, date=today, metric_type=metric_type, value=72.25)
+
+    def assertSameOutput(self, flat, model):
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(flat), renderer.render(model))
+
+    def test_workout_sessions_match(self):
+        queryset = WorkoutSession.objects.all()
+        self.assertSameOutput(
+            FlatWorkoutSessionSerializer(queryset).data,
+            WorkoutSessionSerializer(queryset.prefetch_related('exercise_logs__exercise'), many=True).data,
+        )
+
+    def test_exercise_logs_match(self):
+        queryset = ExerciseLog.objects.all()
+        self.assertSameOutput(
+            FlatExerciseLogSerializer(queryset).data,
+            ExerciseLogSerializer(queryset, many=True).data,
+        )
+
+    def test_performance_metrics_match(self):
+        queryset = PerformanceMetric.objects.all()
+        self.assertSameOutput(
+            FlatPerformanceMetricSerializer(queryset).data,
+            PerformanceMetricSerializer(queryset, many=True).data,
+        )
+
+
+class FastJSONRendererTests(TestCase):
+
+    def assertRendersLikeJSONRenderer(self, data):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_temporal_values(self):
+        self.assertRendersLikeJSONRenderer({
+            'aware': timezone.now(),
+            'naive': timezone.now().replace(tzinfo=None),
+            'date': date(2025, 1, 2),
+            'time': time(7, 30, 15, 123456),
+            'duration': timedelta(minutes=90),
+        })
+
+    def test_other_values(self):
+        self.assertRendersLikeJSONRenderer({
+            'uuid': uuid.uuid4(),
+            'decimal': Decimal('12.50'),
+            'nested': [{'a': 1.5, 'b': None, 'c': True}],
+            1: 'non-string key',
+            'text': 'caf\u00e9 \u2028 \u2029',
+        })
+
+    def test_serializer_output(self):
+        user = User.objects.create_user(username='athlete')
+        PerformanceMetric.objects.create(user=user, date=date.today(), metric_type='strength', value=70)
+        self.assertRendersLikeJSONRenderer(
+            PerformanceMetricSerializer(PerformanceMetric.objects.all(), many=True).data
+        )
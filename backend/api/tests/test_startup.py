@@ -0,0 +1,46 @@
+"""
+Tests for worker start-up cost
+"""
+
+import json
+import subprocess
+import sys
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, override_settings
+
+from api.signals import SYNCED_MODELS
+from api.sync import SYNC_MODELS
+
+
+class StartupTests(SimpleTestCase):
+
+    def test_setup_does_not_import_serializers(self):
+        script = (
+            "import json, os, sys, django\n"
+            "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'optitrain.settings')\n"
+            "django.setup()\n"
+            "print(json.dumps(sorted(m for m in sys.modules if m in "
+            "('api.serializers', 'api.sync', 'rest_framework.serializers'))))\n"
+        )
+        proc = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        )
+
+        self.assertEqual(json.loads(proc.stdout.strip().splitlines()[-1]), [])
+
+    def test_signal_labels_match_sync_models(self):
+        self.assertEqual(SYNCED_MODELS, [model._meta.label_lower for _, model, _, _ in SYNC_MODELS])
+
+    @override_settings(STARTUP_BUDGET={'MAX_STARTUP_MS': 1, 'MAX_RSS_MB': None})
+    def test_profile_startup_enforces_settings_budget(self):
+        with self.assertRaisesMessage(CommandError, 'Startup budget exceeded: cold start'):
+            call_command('profile_startup', runs=1, top=1, stdout=StringIO())
+
+    @override_settings(STARTUP_BUDGET={'MAX_STARTUP_MS': 1, 'MAX_RSS_MB': None})
+    def test_command_line_budget_overrides_settings(self):
+        call_command('profile_startup', runs=1, top=1, max_startup_ms=60000, stdout=StringIO())
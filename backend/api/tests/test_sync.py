@@ -0,0 +1,112 @@
+"""
+Tests for delta sync
+"""
+
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from api.models import WorkoutPlan, WorkoutSession, Goal, Tombstone
+from api.sync import collect_changes, decode_token, prune_tombstones, safety_lag, tombstone_ttl
+
+
+class SyncTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='athlete')
+        self.other = User.objects.create_user(username='other')
+        self.plan = WorkoutPlan.objects.create(user=self.user, name='Base')
+        self.session = WorkoutSession.objects.create(
+            user=self.user, name='Legs', date=timezone.now().date()
+        )
+        WorkoutPlan.objects.create(user=self.other, name='Not mine')
+
+    def sync(self, token=None):
+        since = decode_token(token) if token else None
+        return collect_changes(since, timezone.now(), self.user)
+
+    def age(self, *instances):
+        # Move rows out of the overlap window the next token re-sends
+        old = timezone.now() - safety_lag() * 2
+        for instance in instances:
+            type(instance).objects.filter(pk=instance.pk).update(updated_at=old)
+
+    def test_initial_sync_is_full_snapshot_of_own_rows(self):
+        result = self.sync()
+
+        self.assertTrue(result['full'])
+        self.assertEqual([p['id'] for p in result['changes']['workout-plans']], [self.plan.pk])
+        self.assertEqual([s['id'] for s in result['changes']['workout-sessions']], [self.session.pk])
+
+    def test_delta_returns_creates_updates_and_deletes(self):
+        self.age(self.plan, self.session)
+        token = self.sync()['token']
+
+        goal = Goal.objects.create(user=self.user, title='5k')
+        self.plan.name = 'Base v2'
+        self.plan.save()
+        session_id = self.session.pk
+        self.session.delete()
+        Goal.objects.create(user=self.other, title='Not mine')
+
+        result = self.sync(token)
+        self.assertFalse(result['full'])
+        self.assertEqual([g['id'] for g in result['changes']['goals']], [goal.pk])
+        self.assertEqual([p['name'] for p in result['changes']['workout-plans']], ['Base v2'])
+        self.assertEqual(result['changes']['workout-sessions'], [])
+        self.assertEqual(result['deleted']['workout-sessions'], [session_id])
+        self.assertEqual(result['deleted']['goals'], [])
+
+    def test_unchanged_rows_are_not_resent(self):
+        self.age(self.plan, self.session)
+        token = self.sync()['token']
+
+        result = self.sync(token)
+        self.assertEqual(result['changes']['workout-plans'], [])
+        self.assertEqual(result['changes']['workout-sessions'], [])
+
+    def test_late_commit_inside_lag_is_delivered(self):
+        # A row stamped before the sync but committed after it
+        until = timezone.now()
+        token = collect_changes(None, until, self.user)['token']
+        late = Goal.objects.create(user=self.user, title='Late')
+        Goal.objects.filter(pk=late.pk).update(updated_at=until - timedelta(seconds=1))
+
+        result = self.sync(token)
+        self.assertIn(late.pk, [g['id'] for g in result['changes']['goals']])
+
+    def test_malformed_token_is_rejected(self):
+        with self.assertRaises(ValueError):
+            decode_token('not-a-token')
+
+    def test_sessions_are_resent_when_their_plan_is_deleted(self):
+        self.session.workout_plan = self.plan
+        self.session.save()
+        self.age(self.plan, self.session)
+        token = self.sync()['token']
+
+        plan_id = self.plan.pk
+        self.plan.delete()
+
+        result = self.sync(token)
+        self.assertEqual(result['deleted']['workout-plans'], [plan_id])
+        sessions = result['changes']['workout-sessions']
+        self.assertEqual([(s['id'], s['workout_plan']) for s in sessions], [(self.session.pk, None)])
+
+    def test_token_older_than_tombstone_ttl_gets_full_snapshot(self):
+        until = timezone.now() - tombstone_ttl() - timedelta(days=1)
+        token = collect_changes(None, until, self.user)['token']
+
+        result = self.sync(token)
+        self.assertTrue(result['full'])
+        self.assertEqual([p['id'] for p in result['changes']['workout-plans']], [self.plan.pk])
+
+    def test_expired_tombstones_are_pruned(self):
+        self.session.delete()
+        Tombstone.objects.update(deleted_at=timezone.now() - tombstone_ttl() - timedelta(days=1))
+        self.plan.delete()
+
+        self.assertEqual(prune_tombstones(), 1)
+        self.assertEqual(list(Tombstone.objects.values_list('model', flat=True)), ['api.workoutplan'])
@@ -0,0 +1,187 @@
+"""
+Tests for the background task queue
+"""
+
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api.models import Task
+from api.tasks import background_task, claim_next, enqueue, retry_delay, run_task, work
+
+
+@background_task
+def add(a, b):
+    return a + b
+
+
+@background_task
+def always_fails():
+    raise RuntimeError('boom')
+
+
+@background_task
+def unencodable():
+    return object()
+
+
+TASK_QUEUE = {
+    'MAX_ATTEMPTS': 3,
+    'RETRY_BACKOFF': 2.0,
+    'RETRY_BACKOFF_MAX': 5,
+    'VISIBILITY_TIMEOUT': 300,
+}
+
+
+@override_settings(TASK_QUEUE=TASK_QUEUE)
+class TaskQueueTests(TestCase):
+
+    def test_claim_marks_running_and_counts_attempt(self):
+        task = enqueue(add, a=1, b=2)
+        claimed = claim_next('worker-a')
+
+        self.assertEqual(claimed.pk, task.pk)
+        self.assertEqual(claimed.status, Task.RUNNING)
+        self.assertEqual(claimed.locked_by, 'worker-a')
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNone(claim_next('worker-b'))
+
+    def test_claim_loses_race_to_another_worker(self):
+        # worker-a claims the task between worker-b's candidate query and
+        # worker-b's conditional UPDATE
+        task = enqueue(add, a=1, b=2)
+        race = {}
+
+        def interleave(execute, sql, params, many, context):
+            if 'worker-b' in (params or ()) and not race:
+                race['winner'] = claim_next('worker-a')
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(interleave):
+            claimed = claim_next('worker-b')
+
+        self.assertIsNone(claimed)
+        self.assertEqual(race['winner'].pk, task.pk)
+        task.refresh_from_db()
+        self.assertEqual(task.locked_by, 'worker-a')
+        self.assertEqual(task.attempts, 1)
+
+    def test_workers_claim_distinct_tasks(self):
+        tasks = [enqueue(add, a=i, b=i) for i in range(3)]
+        claimed = [claim_next(f'worker-{i}') for i in range(3)]
+
+        self.assertCountEqual([t.pk for t in claimed], [t.pk for t in tasks])
+        self.assertIsNone(claim_next('worker-3'))
+
+    def test_success_records_result_and_releases_lock(self):
+        enqueue(add, a=1, b=2)
+        task = claim_next('worker-a')
+
+        self.assertTrue(run_task(task))
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.SUCCEEDED)
+        self.assertEqual(task.result, 3)
+        self.assertEqual(task.locked_by, '')
+        self.assertIsNone(task.locked_at)
+
+    def test_failures_back_off_then_fail(self):
+        task = enqueue(always_fails)
+
+        for attempt, delay in [(1, 2), (2, 4)]:
+            claimed = claim_next('worker-a')
+            before = timezone.now()
+            run_task(claimed)
+            task.refresh_from_db()
+            self.assertEqual(task.status, Task.PENDING)
+            self.assertEqual(task.attempts, attempt)
+            self.assertIn('boom', task.error)
+            self.assertAlmostEqual(
+                (task.run_after - before).total_seconds(), delay, delta=1
+            )
+            # Not due until the backoff has passed
+            self.assertIsNone(claim_next('worker-a'))
+            Task.objects.filter(pk=task.pk).update(run_after=timezone.now())
+
+        run_task(claim_next('worker-a'))
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertEqual(task.attempts, 3)
+        self.assertIsNone(claim_next('worker-a'))
+
+    def test_retry_delay_is_capped(self):
+        self.assertEqual([retry_delay(n) for n in range(1, 5)], [2, 4, 5, 5])
+
+    def test_abandoned_task_is_reclaimed_until_out_of_attempts(self):
+        task = enqueue(add, max_attempts=2, a=1, b=2)
+        stale = timezone.now() - timedelta(seconds=TASK_QUEUE['VISIBILITY_TIMEOUT'] + 1)
+
+        claim_next('worker-a')
+        Task.objects.filter(pk=task.pk).update(locked_at=stale)
+        reclaimed = claim_next('worker-b')
+        self.assertEqual(reclaimed.locked_by, 'worker-b')
+        self.assertEqual(reclaimed.attempts, 2)
+
+        # worker-b dies too; no attempts are left
+        Task.objects.filter(pk=task.pk).update(locked_at=stale)
+        self.assertIsNone(claim_next('worker-c'))
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+
+    def test_live_task_is_not_reclaimed(self):
+        enqueue(add, a=1, b=2)
+        claim_next('worker-a')
+
+        self.assertIsNone(claim_next('worker-b'))
+
+    def test_reclaimed_worker_does_not_overwrite_result(self):
+        task = enqueue(add, a=1, b=2)
+        claimed = claim_next('worker-a')
+        Task.objects.filter(pk=task.pk).update(locked_by='worker-b')
+
+        self.assertFalse(run_task(claimed))
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.RUNNING)
+        self.assertEqual(task.locked_by, 'worker-b')
+        self.assertIsNone(task.result)
+
+    def test_coalesced_enqueue_returns_inflight_task(self):
+        first = enqueue(add, coalesce=True, a=1, b=2)
+        second = enqueue(add, coalesce=True, a=1, b=2)
+        other = enqueue(add, coalesce=True, a=2, b=2)
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertNotEqual(first.pk, other.pk)
+
+    def test_unencodable_result_takes_retry_path(self):
+        task = enqueue(unencodable, max_attempts=1)
+
+        self.assertTrue(run_task(claim_next('worker-a')))
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertIn('not JSON serializable', task.error)
+        self.assertEqual(task.locked_by, '')
+
+    def test_worker_survives_errors_and_keeps_working(self):
+        failing = enqueue(unencodable, max_attempts=1)
+        task = enqueue(add, a=1, b=2)
+        real_claim = claim_next
+        calls = []
+
+        def flaky_claim(worker_id):
+            calls.append(worker_id)
+            if len(calls) == 1:
+                raise RuntimeError('database went away')
+            return real_claim(worker_id)
+
+        with mock.patch('api.tasks.claim_next', flaky_claim), \
+                override_settings(TASK_QUEUE=dict(TASK_QUEUE, POLL_INTERVAL=0)):
+            work('worker-a', burst=True)
+
+        failing.refresh_from_db()
+        task.refresh_from_db()
+        self.assertEqual(failing.status, Task.FAILED)
+        self.assertEqual(task.status, Task.SUCCEEDED)
+        self.assertEqual(task.result, 3)
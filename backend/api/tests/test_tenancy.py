@@ -0,0 +1,93 @@
+"""
+Tests for per-user data isolation and shard assignment
+"""
+
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Exercise, WorkoutSession, ExerciseLog, ShardAssignment
+from api.routers import shard_for
+
+
+class TenancyTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='athlete')
+        self.other = User.objects.create_user(username='other')
+        self.exercise = Exercise.objects.create(name='Squat')
+        self.session = WorkoutSession.objects.create(
+            user=self.user, name='Legs', date=timezone.now().date()
+        )
+        self.foreign = WorkoutSession.objects.create(
+            user=self.other, name='Theirs', date=timezone.now().date()
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_returns_only_own_rows(self):
+        response = self.client.get('/api/workout-sessions/')
+
+        self.assertEqual(response.status_code, 200)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual([row['id'] for row in rows], [self.session.pk])
+
+    def test_other_users_row_is_not_found(self):
+        response = self.client.get(f'/api/workout-sessions/{self.foreign.pk}/')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_log_on_other_users_session_is_rejected(self):
+        response = self.client.post('/api/exercise-logs/', {
+            'session': self.foreign.pk, 'exercise': self.exercise.pk, 'sets': 3,
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('session', response.data)
+        self.assertFalse(ExerciseLog.objects.filter(session=self.foreign).exists())
+
+
+class ShardAssignmentTests(TestCase):
+
+    def setUp(self):
+        # Created before sharding is switched on, so nothing is mirrored
+        # to the placeholder aliases below
+        self.users = [User.objects.create_user(username=f'user{i}') for i in range(4)]
+
+    def test_assignment_survives_adding_a_shard(self):
+        with override_settings(USER_SHARDING={
+            'DATABASES': ['shard_a', 'shard_b'], 'MODELS': ['api.workoutsession'],
+        }):
+            before = {user.pk: shard_for(WorkoutSession, user.pk) for user in self.users}
+
+        with override_settings(USER_SHARDING={
+            'DATABASES': ['shard_a', 'shard_b', 'shard_c'], 'MODELS': ['api.workoutsession'],
+        }):
+            after = {user.pk: shard_for(WorkoutSession, user.pk) for user in self.users}
+
+        self.assertEqual(before, after)
+        self.assertEqual(ShardAssignment.objects.count(), len(self.users))
+
+    def test_assign_shards_pins_existing_users(self):
+        sharding = {'DATABASES': ['shard_a', 'shard_b'], 'MODELS': ['api.workoutsession']}
+        with override_settings(USER_SHARDING=sharding):
+            call_command('assign_shards', stdout=StringIO())
+
+        assignments = dict(ShardAssignment.objects.values_list('user_id', 'database'))
+        self.assertEqual(assignments, {
+            user.pk: sharding['DATABASES'][user.pk % 2] for user in self.users
+        })
+
+    def test_unsharded_models_and_single_database_are_not_assigned(self):
+        with override_settings(USER_SHARDING={'DATABASES': ['default'], 'MODELS': ['api.workoutsession']}):
+            self.assertIsNone(shard_for(WorkoutSession, self.users[0].pk))
+        with override_settings(USER_SHARDING={
+            'DATABASES': ['shard_a', 'shard_b'], 'MODELS': ['api.workoutsession'],
+        }):
+            self.assertIsNone(shard_for(Exercise, self.users[0].pk))
+
+        self.assertFalse(ShardAssignment.objects.exists())
@@ -0,0 +1,79 @@
+"""
+Tests for the token bucket throttles
+"""
+
+import time
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.models import RateLimitBucket
+from api.throttling import ChatIPThrottle, ChatUserThrottle, prune_idle_buckets
+
+
+@override_settings(REST_FRAMEWORK={
+    'NUM_PROXIES': 0,
+    'DEFAULT_THROTTLE_RATES': {'chat_user': '3/min', 'chat_ip': '3/min'},
+})
+class ThrottleTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='athlete')
+
+    def request(self, **headers):
+        request = Request(APIRequestFactory().post('/api/chat/', **headers))
+        request.user = self.user
+        return request
+
+    def test_bucket_empties_then_reports_wait(self):
+        allowed = []
+        for _ in range(4):
+            throttle = ChatUserThrottle()
+            allowed.append(throttle.allow_request(self.request(), None))
+
+        self.assertEqual(allowed, [True, True, True, False])
+        self.assertAlmostEqual(throttle.wait(), 20, delta=1)
+
+    def test_lost_compare_and_swap_is_retried(self):
+        ChatUserThrottle().allow_request(self.request(), None)
+        race = {}
+
+        def interleave(execute, sql, params, many, context):
+            # Another worker takes a token between our read and our update
+            if sql.startswith('UPDATE') and not race:
+                race['done'] = True
+                RateLimitBucket.objects.update(tokens=1, stamp=time.time())
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(interleave):
+            self.assertTrue(ChatUserThrottle().allow_request(self.request(), None))
+        self.assertLess(RateLimitBucket.objects.get().tokens, 1)
+
+    def test_idle_buckets_are_pruned(self):
+        now = time.time()
+        RateLimitBucket.objects.create(key='chat:user:idle', tokens=3, stamp=now - 61)
+        RateLimitBucket.objects.create(key='chat:user:busy', tokens=0, stamp=now - 10)
+
+        self.assertEqual(prune_idle_buckets(now), 1)
+        self.assertEqual(list(RateLimitBucket.objects.values_list('key', flat=True)), ['chat:user:busy'])
+
+    def test_forwarded_for_cannot_pick_a_new_bucket(self):
+        allowed = [
+            ChatIPThrottle().allow_request(self.request(HTTP_X_FORWARDED_FOR=f'10.0.0.{i}'), None)
+            for i in range(4)
+        ]
+
+        self.assertEqual(allowed, [True, True, True, False])
+        self.assertEqual(RateLimitBucket.objects.count(), 1)
+
+    def test_long_forwarded_chain_fits_the_key(self):
+        chain = ', '.join(f'203.0.113.{i}' for i in range(60))
+        with override_settings(REST_FRAMEWORK={'NUM_PROXIES': None, 'DEFAULT_THROTTLE_RATES': {'chat_ip': '3/min'}}):
+            self.assertTrue(ChatIPThrottle().allow_request(self.request(HTTP_X_FORWARDED_FOR=chain), None))
+
+        key = RateLimitBucket.objects.get().key
+        self.assertLessEqual(len(key), RateLimitBucket._meta.get_field('key').max_length)
+        self.assertNotIn('203.0.113', key)
@@ -0,0 +1,208 @@
+"""
+Rate limiting and request coalescing for OptiTrain API
+
+Token buckets live in the RateLimitBucket table and are updated with a
+compare-and-swap on the refill stamp, so every worker process shares the
+same limits without an external cache. Rates come from DRF's
+DEFAULT_THROTTLE_RATES under ``<scope>_user`` and ``<scope>_ip``; a rate
+of ``30/min`` gives a bucket of 30 tokens refilled at 30 per minute.
+Buckets left idle long enough to refill completely are deleted by
+``prune_idle_buckets`` (`manage.py prune_throttle_buckets`).
+
+RequestCoalescer only shares work between requests handled by the same
+worker process. Across workers, only queued tasks (``?async=true``) are
+deduplicated, through Task.dedupe_key.
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .models import RateLimitBucket
+
+CAS_RETRIES = 5
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """Turn '30/min' into (30, 60)"""
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Token bucket throttle keyed by ``get_ident_key``; subclasses set ``scope``"""
+    scope = None
+    kind = None
+
+    def __init__(self):
+        rate_name = f'{self.scope}_{self.kind}'
+        try:
+            rate = api_settings.DEFAULT_THROTTLE_RATES[rate_name]
+        except KeyError:
+            raise ImproperlyConfigured(f"No throttle rate set for '{rate_name}' scope")
+        num_requests, duration = parse_rate(rate)
+        self.capacity = float(num_requests)
+        self.refill_rate = num_requests / duration
+        self.retry_after = None
+
+    def get_ident_key(self, request):
+        raise NotImplementedError('.get_ident_key() must be overridden')
+
+    def allow_request(self, request, view):
+        ident = self.get_ident_key(request)
+        if ident is None:
+            return True
+        # Hashed, so a long forwarded-for chain cannot overflow the key column
+        digest = hashlib.sha256(str(ident).encode()).hexdigest()
+        key = f'{self.scope}:{self.kind}:{digest}'
+
+        for _ in range(CAS_RETRIES):
+            now = time.time()
+            bucket = self._get_bucket(key, now)
+            tokens = min(self.capacity, bucket.tokens + (now - bucket.stamp) * self.refill_rate)
+            if tokens < 1:
+                self.retry_after = (1 - tokens) / self.refill_rate
+                return False
+            updated = RateLimitBucket.objects.filter(pk=bucket.pk, stamp=bucket.stamp).update(
+                tokens=tokens - 1, stamp=now
+            )
+            if updated:
+                return True
+        # Heavy contention on one bucket; treat it as exhausted
+        self.retry_after = 1 / self.refill_rate
+        return False
+
+    def _get_bucket(self, key, now):
+        bucket = RateLimitBucket.objects.filter(key=key).first()
+        if bucket is not None:
+            return bucket
+        try:
+            with transaction.atomic():
+                return RateLimitBucket.objects.create(key=key, tokens=self.capacity, stamp=now)
+        except IntegrityError:
+            return RateLimitBucket.objects.get(key=key)
+
+    def wait(self):
+        return self.retry_after
+
+
+def prune_idle_buckets(now=None):
+    """
+    Delete buckets untouched for longer than their refill period. Such a
+    bucket is full again, which is what a missing bucket starts as, so no
+    limit changes. Returns the number of rows deleted.
+    """
+    now = now if now is not None else time.time()
+    deleted = 0
+    for rate_name, rate in api_settings.DEFAULT_THROTTLE_RATES.items():
+        if rate is None:
+            continue
+        scope, _, kind = rate_name.rpartition('_')
+        _, duration = parse_rate(rate)
+        deleted += RateLimitBucket.objects.filter(
+            key__startswith=f'{scope}:{kind}:', stamp__lt=now - duration
+        ).delete()[0]
+    return deleted
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Per-user bucket; anonymous requests are left to the per-IP bucket"""
+    kind = 'user'
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Per-client-IP bucket. Set REST_FRAMEWORK['NUM_PROXIES'] to the number of
+    trusted proxies in front of the app, so clients cannot pick their own
+    bucket by sending an X-Forwarded-For header.
+    """
+    kind = 'ip'
+
+    def get_ident_key(self, request):
+        return self.get_ident(request)
+
+
+class ChatUserThrottle(UserTokenBucketThrottle):
+    scope = 'chat'
+
+
+class ChatIPThrottle(IPTokenBucketThrottle):
+    scope = 'chat'
+
+
+class PlanUserThrottle(UserTokenBucketThrottle):
+    scope = 'plan'
+
+
+class PlanIPThrottle(IPTokenBucketThrottle):
+    scope = 'plan'
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestCoalescer:
+    """
+    Share one computation between identical requests in flight at the same
+    time in this worker. Retrying clients that resubmit while the first
+    request is still running wait for, and receive, its result. A retry
+    routed to another worker process computes the result again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+
+coalescer = RequestCoalescer()
+
+
+def request_key(request, name):
+    """Identify a request by endpoint, caller and body for coalescing"""
+    if request.user and request.user.is_authenticated:
+        caller = f'user:{request.user.pk}'
+    else:
+        caller = f'ip:{BaseThrottle().get_ident(request)}'
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return f'{name}:{caller}:{hashlib.sha256(body.encode()).hexdigest()}'
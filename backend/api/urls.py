@@ -17,5 +17,8 @@ router.register(r'goals', views.GoalViewSet, basename='goal')
 urlpatterns = [
     path('', include(router.urls)),
     path('chat/', views.chat_with_ai, name='chat'),
+    path('sync/', views.sync_changes, name='sync'),
+    path('tasks/<int:pk>/', views.task_status, name='task-status'),
+    path('exports/<str:key>/', views.export_data, name='export'),
     path('health/', views.health_check, name='health-check'),
 ]
@@ -3,24 +3,78 @@ Views for OptiTrain API
 """
 
 from rest_framework import viewsets, status
-from rest_framework.decorators import api_view, action
+from rest_framework.decorators import api_view, action, permission_classes, throttle_classes
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.db.models import Sum, Avg, Count
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.utils import encoders
 from datetime import timedelta
+import json
 import random
 
 from .models import (
     UserProfile, Exercise, WorkoutPlan, WorkoutSession,
-    ExerciseLog, PerformanceMetric, ChatMessage, Goal
+    ExerciseLog, PerformanceMetric, ChatMessage, Goal, Task
 )
 from .serializers import (
     UserSerializer, UserProfileSerializer, ExerciseSerializer,
     WorkoutPlanSerializer, WorkoutSessionSerializer, ExerciseLogSerializer,
     PerformanceMetricSerializer, ChatMessageSerializer, GoalSerializer,
-    WorkoutStatsSerializer, PerformanceForecastSerializer
+    WorkoutStatsSerializer,
+    FlatWorkoutSessionSerializer, FlatExerciseLogSerializer,
+    FlatPerformanceMetricSerializer, TaskSerializer
 )
+from .chat import get_chat_backend
+from .sync import collect_changes, decode_token
+from .tasks import background_task, enqueue
+from .throttling import (
+    ChatUserThrottle, ChatIPThrottle, PlanUserThrottle, PlanIPThrottle,
+    coalescer, request_key
+)
+
+
+class FlatListMixin:
+    """Serve list actions through a read-only FlatSerializer"""
+    flat_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.flat_serializer_class is None or self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(self.flat_serializer_class(queryset).data)
+
+
+class UserScopedViewSetMixin:
+    """Restrict a viewset to the authenticated user's own rows"""
+    permission_classes = [IsAuthenticated]
+    model = None
+
+    def get_queryset(self):
+        return self.model.objects.for_user(self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+def wants_async(request):
+    """Whether the client asked for the work to be queued (`?async=true`)"""
+    return request.query_params.get('async', '').lower() in ('1', 'true', 'yes')
+
+
+def task_accepted(request, task):
+    """202 response pointing the client at the task status endpoint"""
+    status_url = request.build_absolute_uri(reverse('task-status', args=[task.pk]))
+    return Response(
+        {'task_id': task.pk, 'status': task.status, 'status_url': status_url},
+        status=status.HTTP_202_ACCEPTED,
+        headers={'Location': status_url}
+    )
 
 
 class ExerciseViewSet(viewsets.ModelViewSet):
@@ -41,202 +95,204 @@ class ExerciseViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class WorkoutPlanViewSet(viewsets.ModelViewSet):
+class WorkoutPlanViewSet(UserScopedViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for workout plans"""
+    model = WorkoutPlan
     serializer_class = WorkoutPlanSerializer
 
-    def get_queryset(self):
-        # For demo, return all plans
-        return WorkoutPlan.objects.all()
-
-    def perform_create(self, serializer):
-        # For demo, create without user
-        serializer.save()
-
-    @action(detail=False, methods=['post'])
+    @action(detail=False, methods=['post'], throttle_classes=[PlanUserThrottle, PlanIPThrottle])
     def generate_ai_plan(self, request):
         """Generate an AI workout plan based on user preferences"""
-        fitness_level = request.data.get('fitness_level', 'intermediate')
-        goal = request.data.get('goal', 'general_fitness')
-        days_per_week = request.data.get('days_per_week', 3)
-
-        # Simulated AI-generated plan
-        plan_templates = {
-            'weight_loss': {
-                'name': 'Fat Burn Challenge',
-                'description': 'High-intensity cardio and strength training for maximum calorie burn',
-            },
-            'muscle_gain': {
-                'name': 'Muscle Builder Pro',
-                'description': 'Progressive overload program focusing on compound movements',
-            },
-            'general_fitness': {
-                'name': 'Total Body Transformation',
-                'description': 'Balanced program combining strength, cardio, and flexibility',
-            },
-            'endurance': {
-                'name': 'Endurance Elite',
-                'description': 'Build stamina and cardiovascular capacity',
-            },
+        options = {
+            'fitness_level': request.data.get('fitness_level', 'intermediate'),
+            'goal': request.data.get('goal', 'general_fitness'),
+            'days_per_week': request.data.get('days_per_week', 3),
         }
+        if wants_async(request):
+            task = enqueue(build_ai_plan, user=request.user, coalesce=True, **options)
+            return task_accepted(request, task)
+        plan = coalescer.do(request_key(request, 'generate_ai_plan'), lambda: build_ai_plan(**options))
+        return Response(plan)
 
-        template = plan_templates.get(goal, plan_templates['general_fitness'])
-
-        plan_data = {
-            'name': template['name'],
-            'description': template['description'],
-            'is_ai_generated': True,
-            'difficulty': 'medium' if fitness_level == 'intermediate' else ('easy' if fitness_level == 'beginner' else 'hard'),
-            'duration_weeks': 4,
-        }
-
-        return Response({
-            'plan': plan_data,
-            'schedule': self._generate_weekly_schedule(days_per_week, goal),
-            'message': 'AI workout plan generated successfully!'
-        })
 
-    def _generate_weekly_schedule(self, days_per_week, goal):
-        """Generate a weekly workout schedule"""
-        schedules = {
-            3: ['Monday', 'Wednesday', 'Friday'],
-            4: ['Monday', 'Tuesday', 'Thursday', 'Friday'],
-            5: ['Monday', 'Tuesday', 'Wednesday', 'Friday', 'Saturday'],
-            6: ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'],
-        }
-        
-        workout_types = {
-            'weight_loss': ['HIIT Cardio', 'Full Body Strength', 'Cardio & Core'],
-            'muscle_gain': ['Push Day', 'Pull Day', 'Leg Day', 'Upper Body', 'Lower Body'],
-            'general_fitness': ['Upper Body', 'Lower Body', 'Cardio', 'Full Body'],
-            'endurance': ['Long Run', 'Interval Training', 'Cross Training', 'Recovery Run'],
-        }
-        
-        days = schedules.get(days_per_week, schedules[3])
-        workouts = workout_types.get(goal, workout_types['general_fitness'])
-        
-        schedule = []
-        for i, day in enumerate(days):
-            schedule.append({
-                'day': day,
-                'workout': workouts[i % len(workouts)],
-                'duration': random.randint(30, 60),
-            })
-        
-        return schedule
-
-
-class WorkoutSessionViewSet(viewsets.ModelViewSet):
+class WorkoutSessionViewSet(UserScopedViewSetMixin, FlatListMixin, viewsets.ModelViewSet):
     """ViewSet for workout sessions"""
+    model = WorkoutSession
     serializer_class = WorkoutSessionSerializer
-
-    def get_queryset(self):
-        return WorkoutSession.objects.all()
+    flat_serializer_class = FlatWorkoutSessionSerializer
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get workout statistics"""
-        sessions = WorkoutSession.objects.all()
-        today = timezone.now().date()
-        week_ago = today - timedelta(days=7)
-        month_ago = today - timedelta(days=30)
-
-        total_workouts = sessions.count()
-        total_duration = sessions.aggregate(Sum('duration_minutes'))['duration_minutes__sum'] or 0
-        total_calories = sessions.aggregate(Sum('calories_burned'))['calories_burned__sum'] or 0
-        avg_duration = sessions.aggregate(Avg('duration_minutes'))['duration_minutes__avg'] or 0
-
-        workouts_this_week = sessions.filter(date__gte=week_ago).count()
-        workouts_this_month = sessions.filter(date__gte=month_ago).count()
-
-        # Calculate streak (simplified)
-        streak = self._calculate_streak(sessions)
-
-        stats = {
-            'total_workouts': total_workouts,
-            'total_duration': total_duration,
-            'total_calories': total_calories,
-            'avg_workout_duration': round(avg_duration, 1),
-            'workouts_this_week': workouts_this_week,
-            'workouts_this_month': workouts_this_month,
-            'streak_days': streak,
-        }
+        if wants_async(request):
+            task = enqueue(compute_workout_stats, user=request.user, coalesce=True, user_id=request.user.pk)
+            return task_accepted(request, task)
+        return Response(compute_workout_stats(request.user.pk))
 
-        serializer = WorkoutStatsSerializer(stats)
-        return Response(serializer.data)
 
-    def _calculate_streak(self, sessions):
-        """Calculate consecutive workout days"""
-        if not sessions.exists():
-            return 0
-        
-        dates = set(sessions.values_list('date', flat=True))
-        today = timezone.now().date()
-        streak = 0
-        current_date = today
-
-        while current_date in dates or current_date == today:
-            if current_date in dates:
-                streak += 1
-            current_date -= timedelta(days=1)
-            if streak > 0 and current_date not in dates:
-                break
-
-        return streak
-
-
-class ExerciseLogViewSet(viewsets.ModelViewSet):
+class ExerciseLogViewSet(UserScopedViewSetMixin, FlatListMixin, viewsets.ModelViewSet):
     """ViewSet for exercise logs"""
-    queryset = ExerciseLog.objects.all()
+    model = ExerciseLog
     serializer_class = ExerciseLogSerializer
+    flat_serializer_class = FlatExerciseLogSerializer
 
 
-class PerformanceMetricViewSet(viewsets.ModelViewSet):
+class PerformanceMetricViewSet(UserScopedViewSetMixin, FlatListMixin, viewsets.ModelViewSet):
     """ViewSet for performance metrics"""
+    model = PerformanceMetric
     serializer_class = PerformanceMetricSerializer
-
-    def get_queryset(self):
-        return PerformanceMetric.objects.all()
+    flat_serializer_class = FlatPerformanceMetricSerializer
 
     @action(detail=False, methods=['get'])
     def forecast(self, request):
         """Get AI performance forecast"""
+        from .forecasting import compute_performance_forecast
+
         days = int(request.query_params.get('days', 30))
-        
-        # Generate mock forecast data
-        forecasts = []
-        today = timezone.now().date()
-        
-        base_strength = 75
-        base_endurance = 70
-        
-        for i in range(days):
-            date = today + timedelta(days=i)
-            # Simulate gradual improvement with some variation
-            strength = base_strength + (i * 0.3) + random.uniform(-2, 2)
-            endurance = base_endurance + (i * 0.25) + random.uniform(-2, 2)
-            confidence = max(0.5, 0.95 - (i * 0.01))
-            
-            forecasts.append({
-                'date': date,
-                'predicted_strength': round(min(100, strength), 1),
-                'predicted_endurance': round(min(100, endurance), 1),
-                'confidence': round(confidence, 2),
-            })
-        
-        serializer = PerformanceForecastSerializer(forecasts, many=True)
-        return Response(serializer.data)
+        if wants_async(request):
+            task = enqueue(compute_performance_forecast, user=request.user, coalesce=True, days=days)
+            return task_accepted(request, task)
+        return Response(compute_performance_forecast(days))
 
 
-class GoalViewSet(viewsets.ModelViewSet):
+class GoalViewSet(UserScopedViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for user goals"""
+    model = Goal
     serializer_class = GoalSerializer
 
-    def get_queryset(self):
-        return Goal.objects.all()
+
+@background_task
+def build_ai_plan(fitness_level='intermediate', goal='general_fitness', days_per_week=3):
+    """Build an AI workout plan based on user preferences"""
+    # Simulated AI-generated plan
+    plan_templates = {
+        'weight_loss': {
+            'name': 'Fat Burn Challenge',
+            'description': 'High-intensity cardio and strength training for maximum calorie burn',
+        },
+        'muscle_gain': {
+            'name': 'Muscle Builder Pro',
+            'description': 'Progressive overload program focusing on compound movements',
+        },
+        'general_fitness': {
+            'name': 'Total Body Transformation',
+            'description': 'Balanced program combining strength, cardio, and flexibility',
+        },
+        'endurance': {
+            'name': 'Endurance Elite',
+            'description': 'Build stamina and cardiovascular capacity',
+        },
+    }
+
+    template = plan_templates.get(goal, plan_templates['general_fitness'])
+
+    plan_data = {
+        'name': template['name'],
+        'description': template['description'],
+        'is_ai_generated': True,
+        'difficulty': 'medium' if fitness_level == 'intermediate' else ('easy' if fitness_level == 'beginner' else 'hard'),
+        'duration_weeks': 4,
+    }
+
+    return {
+        'plan': plan_data,
+        'schedule': generate_weekly_schedule(days_per_week, goal),
+        'message': 'AI workout plan generated successfully!'
+    }
+
+
+def generate_weekly_schedule(days_per_week, goal):
+    """Generate a weekly workout schedule"""
+    schedules = {
+        3: ['Monday', 'Wednesday', 'Friday'],
+        4: ['Monday', 'Tuesday', 'Thursday', 'Friday'],
+        5: ['Monday', 'Tuesday', 'Wednesday', 'Friday', 'Saturday'],
+        6: ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'],
+    }
+    
+    workout_types = {
+        'weight_loss': ['HIIT Cardio', 'Full Body Strength', 'Cardio & Core'],
+        'muscle_gain': ['Push Day', 'Pull Day', 'Leg Day', 'Upper Body', 'Lower Body'],
+        'general_fitness': ['Upper Body', 'Lower Body', 'Cardio', 'Full Body'],
+        'endurance': ['Long Run', 'Interval Training', 'Cross Training', 'Recovery Run'],
+    }
+    
+    days = schedules.get(days_per_week, schedules[3])
+    workouts = workout_types.get(goal, workout_types['general_fitness'])
+    
+    schedule = []
+    for i, day in enumerate(days):
+        schedule.append({
+            'day': day,
+            'workout': workouts[i % len(workouts)],
+            'duration': random.randint(30, 60),
+        })
+    
+    return schedule
+
+
+@background_task
+def compute_workout_stats(user_id):
+    """Compute workout statistics for one user"""
+    sessions = WorkoutSession.objects.for_user(user_id)
+    today = timezone.now().date()
+    week_ago = today - timedelta(days=7)
+    month_ago = today - timedelta(days=30)
+
+    total_workouts = sessions.count()
+    total_duration = sessions.aggregate(Sum('duration_minutes'))['duration_minutes__sum'] or 0
+    total_calories = sessions.aggregate(Sum('calories_burned'))['calories_burned__sum'] or 0
+    avg_duration = sessions.aggregate(Avg('duration_minutes'))['duration_minutes__avg'] or 0
+
+    workouts_this_week = sessions.filter(date__gte=week_ago).count()
+    workouts_this_month = sessions.filter(date__gte=month_ago).count()
+
+    # Calculate streak (simplified)
+    streak = calculate_streak(sessions)
+
+    stats = {
+        'total_workouts': total_workouts,
+        'total_duration': total_duration,
+        'total_calories': total_calories,
+        'avg_workout_duration': round(avg_duration, 1),
+        'workouts_this_week': workouts_this_week,
+        'workouts_this_month': workouts_this_month,
+        'streak_days': streak,
+    }
+
+    return WorkoutStatsSerializer(stats).data
+
+
+def calculate_streak(sessions):
+    """Calculate consecutive workout days"""
+    if not sessions.exists():
+        return 0
+    
+    dates = set(sessions.values_list('date', flat=True))
+    today = timezone.now().date()
+    streak = 0
+    current_date = today
+
+    while current_date in dates or current_date == today:
+        if current_date in dates:
+            streak += 1
+        current_date -= timedelta(days=1)
+        if streak > 0 and current_date not in dates:
+            break
+
+    return streak
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def task_status(request, pk):
+    """Poll the status and result of a background task"""
+    task = get_object_or_404(Task.objects.filter(user=request.user), pk=pk)
+    return Response(TaskSerializer(task).data)
 
 
 @api_view(['POST'])
+@throttle_classes([ChatUserThrottle, ChatIPThrottle])
 def chat_with_ai(request):
     """
     AI chatbot endpoint for fitness coaching
@@ -249,8 +305,9 @@ def chat_with_ai(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Simulated AI responses based on keywords
-    ai_response = generate_ai_response(user_message)
+    ai_response = coalescer.do(
+        request_key(request, 'chat'), lambda: get_chat_backend()(user_message)
+    )
     
     return Response({
         'user_message': user_message,
@@ -259,56 +316,58 @@ def chat_with_ai(request):
     })
 
 
-def generate_ai_response(message):
-    """Generate contextual AI responses for fitness queries"""
-    message_lower = message.lower()
-    
-    responses = {
-        'workout': [
-            "Based on your fitness level, I recommend starting with a full-body workout 3 times per week. Focus on compound movements like squats, deadlifts, and bench press for maximum efficiency.",
-            "Great question! For optimal results, try alternating between strength training and cardio. I suggest a push/pull/legs split if you can commit to 4-5 days per week.",
-            "Let me create a personalized workout plan for you. Would you prefer to focus on strength, endurance, or a balanced approach?",
-        ],
-        'diet': [
-            "Nutrition is crucial for your fitness goals! Aim for 1.6-2.2g of protein per kg of body weight if you're building muscle. Don't forget to stay hydrated!",
-            "For sustainable results, focus on whole foods: lean proteins, complex carbs, healthy fats, and plenty of vegetables. Would you like a sample meal plan?",
-            "Pre-workout, try eating complex carbs 2-3 hours before. Post-workout, aim for protein within 30-60 minutes to optimize recovery.",
-        ],
-        'rest': [
-            "Recovery is just as important as training! Aim for 7-9 hours of sleep and include at least 1-2 rest days per week.",
-            "Active recovery like light walking, stretching, or yoga can help reduce muscle soreness. Don't underestimate the power of rest!",
-            "Signs you need more rest: persistent fatigue, decreased performance, or mood changes. Listen to your body!",
-        ],
-        'motivation': [
-            "Remember, consistency beats perfection! Even a 15-minute workout is better than none. You've got this!",
-            "Set small, achievable goals and celebrate each milestone. Progress is progress, no matter how small!",
-            "Track your progress with photos and measurements, not just the scale. Your body is changing even when the numbers don't show it!",
-        ],
-        'weight': [
-            "For healthy weight loss, aim for 0.5-1kg per week through a moderate calorie deficit. Crash diets don't work long-term!",
-            "Building muscle can actually help with weight management as muscle burns more calories at rest. Consider adding resistance training!",
-            "Focus on body composition rather than just weight. You might be gaining muscle while losing fat!",
-        ],
-        'muscle': [
-            "For muscle growth, progressive overload is key. Gradually increase weight, reps, or sets over time.",
-            "The muscle-building sweet spot is typically 8-12 reps per set with weights that challenge you by the last few reps.",
-            "Don't forget about the mind-muscle connection! Focus on the muscle you're working for better activation and results.",
-        ],
-    }
-    
-    # Find matching category
-    for keyword, response_list in responses.items():
-        if keyword in message_lower:
-            return random.choice(response_list)
-    
-    # Default responses
-    default_responses = [
-        "I'm here to help with your fitness journey! You can ask me about workouts, nutrition, recovery, or motivation. What would you like to know?",
-        "That's a great question! To give you the best advice, could you tell me more about your current fitness level and goals?",
-        "I'd love to help you achieve your fitness goals! What specific area would you like to focus on - strength, cardio, flexibility, or nutrition?",
-    ]
-    
-    return random.choice(default_responses)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_changes(request):
+    """
+    Delta sync for offline-first clients.
+    Returns rows created, updated or deleted since the opaque `since` token.
+    """
+    since = request.query_params.get('since')
+    if since:
+        try:
+            since = decode_token(since)
+        except ValueError:
+            return Response(
+                {'error': 'Invalid sync token'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    else:
+        since = None
+
+    return Response(collect_changes(since, timezone.now(), request.user))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_data(request, key):
+    """
+    Stream the user's rows as NDJSON, including rows already moved to the
+    archive. Optional `from` and `to` dates bound the range (to exclusive).
+    """
+    from .retention import EXPORT_MODELS, export_rows
+
+    model = EXPORT_MODELS.get(key)
+    if model is None:
+        return Response({'error': 'Unknown export'}, status=status.HTTP_404_NOT_FOUND)
+
+    bounds = {}
+    for param in ('from', 'to'):
+        value = request.query_params.get(param)
+        bounds[param] = parse_date(value) if value else None
+        if value and bounds[param] is None:
+            return Response(
+                {'error': f'Invalid {param} date'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+    rows = export_rows(model, request.user, bounds['from'], bounds['to'])
+    response = StreamingHttpResponse(
+        (json.dumps(row, cls=encoders.JSONEncoder) + '\n' for row in rows),
+        content_type='application/x-ndjson'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{key}.ndjson"'
+    return response
 
 
 @api_view(['GET'])
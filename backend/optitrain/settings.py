@@ -63,6 +63,19 @@ DATABASES = {
     }
 }
 
+# Spread the large per-user tables across several databases by user id.
+# List two or more aliases from DATABASES in 'DATABASES' to enable it.
+# REPLICATED models are copied from 'default' to every shard on save/delete.
+USER_SHARDING = {
+    'DATABASES': [],
+    'MODELS': [
+        'api.workoutplan', 'api.workoutsession', 'api.exerciselog', 'api.performancemetric',
+    ],
+    'REPLICATED': ['auth.user', 'api.exercise'],
+}
+
+DATABASE_ROUTERS = ['api.routers.UserShardRouter']
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -88,7 +101,59 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # Uses orjson when installed, otherwise behaves like JSONRenderer
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'api.renderers.FastJSONRenderer',
     ],
+    # Trusted reverse proxies in front of the app. Client IPs for throttling
+    # are taken from X-Forwarded-For only this many hops back; 0 uses
+    # REMOTE_ADDR and ignores the header.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+    # Token bucket sizes and refill rates for api.throttling
+    'DEFAULT_THROTTLE_RATES': {
+        'chat_user': os.environ.get('THROTTLE_CHAT_USER', '30/min'),
+        'chat_ip': os.environ.get('THROTTLE_CHAT_IP', '60/min'),
+        'plan_user': os.environ.get('THROTTLE_PLAN_USER', '10/min'),
+        'plan_ip': os.environ.get('THROTTLE_PLAN_IP', '20/min'),
+    },
+}
+
+# Seconds the delta sync token trails the sync time, so rows committed after
+# a sync with an earlier updated_at are re-sent on the next one (api/sync.py)
+SYNC_SAFETY_LAG = 60
+
+# Days tombstones are kept (`manage.py prune_tombstones`); older sync tokens
+# get a full snapshot instead of a delta
+SYNC_TOMBSTONE_TTL = 30
+
+# Background task queue (see api/tasks.py and `manage.py run_workers`)
+TASK_QUEUE = {
+    'WORKERS': int(os.environ.get('TASK_WORKERS', 2)),
+    'MODE': os.environ.get('TASK_WORKER_MODE', 'thread'),
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_BACKOFF': 2.0,
+    'VISIBILITY_TIMEOUT': 300,
 }
+
+# Retention policies (see api/retention.py and `manage.py archive_data`).
+# FORMAT 'auto' writes Parquet when pyarrow is installed, else gzip NDJSON.
+RETENTION = {
+    'ARCHIVE_ROOT': Path(os.environ.get('ARCHIVE_ROOT', BASE_DIR / 'archive')),
+    'FORMAT': 'auto',
+    'CHUNK_SIZE': 1000,
+    'MAX_ROWS': 50000,
+    'POLICIES': {
+        'api.chatmessage': {'days': 180, 'date_field': 'created_at'},
+        'api.exerciselog': {'days': 365, 'date_field': 'updated_at'},
+    },
+}
+
+# Cold start limits enforced by `manage.py profile_startup`
+STARTUP_BUDGET = {
+    'MAX_STARTUP_MS': float(os.environ.get('STARTUP_BUDGET_MS', 1500)),
+    'MAX_RSS_MB': float(os.environ.get('STARTUP_BUDGET_RSS_MB', 120)),
+}
+
+# Function answering /api/chat/ messages; imported on the first chat request
+CHAT_BACKEND = os.environ.get('CHAT_BACKEND', 'api.chat.generate_ai_response')